@@ -1,11 +1,19 @@
+import asyncio
+import os
+import re
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
-from .config import DEFAULT_REQUEST_SETTINGS, DEFAULT_SETTINGS
+from .config import DEFAULT_REQUEST_SETTINGS, DEFAULT_SETTINGS, LOCAL_API_BASES
 from .mcts import MCTS, Node
 
+# matches the provider prefix of local inference servers, e.g. "ollama/" in "ollama/llama3.2"
+_LOCAL_PROVIDER_RE = re.compile(
+    "^(" + "|".join(re.escape(provider) for provider in LOCAL_API_BASES) + ")/"
+)
+
 
 @dataclass
 class MCTSResult:
@@ -38,25 +46,35 @@ class MonteCarloLLM:
         self.model_name: str = model_name if model_name else DEFAULT_SETTINGS["model"]
         self.api_base = api_base
 
-        if not self.api_base and "ollama" in model_name:
-            self.api_base = DEFAULT_SETTINGS["ollama_api_base"]
+        if not self.api_base:
+            # local inference servers (Ollama, vLLM, LM Studio) default to their usual port,
+            # unless the api_base is configured in the environment, where litellm reads it from
+            local_provider = _LOCAL_PROVIDER_RE.match(self.model_name)
+            if local_provider is not None:
+                env_var, default_api_base = LOCAL_API_BASES[local_provider.group(1)]
+                if not os.getenv(env_var):
+                    self.api_base = default_api_base
 
     def generate(
         self,
         prompt: str,
-        request_settings: Dict[str, Any] = DEFAULT_REQUEST_SETTINGS,
+        request_settings: Optional[Dict[str, Any]] = None,
         iterations: int = DEFAULT_SETTINGS["iterations"],
         max_children: int = DEFAULT_SETTINGS["max_children"],
         verbose: bool = DEFAULT_SETTINGS["verbose"],
         exploration_weight: float = DEFAULT_SETTINGS["exploration_weight"],
+        num_workers: int = DEFAULT_SETTINGS["num_workers"],
+        parallel: int = DEFAULT_SETTINGS["parallel"],
+        convergence_threshold: float = DEFAULT_SETTINGS["convergence_threshold"],
     ) -> MCTSResult:
         """
         Generates a response using Monte Carlo Tree Search (MCTS).
 
         Args:
             prompt (str): The input prompt for the language model.
-            request_settings (Dict[str, Any], optional): Settings for the request to the language
-                model API. Defaults to DEFAULT_REQUEST_SETTINGS.
+            request_settings (Optional[Dict[str, Any]], optional): Settings for the request to the
+                language model API. Defaults to DEFAULT_REQUEST_SETTINGS. The given dictionary is
+                not modified.
             iterations (int, optional): The number of iterations for the MCTS process. Defaults to
                 DEFAULT_SETTINGS["iterations"].
             max_children (int, optional): The maximum number of child nodes to expand per node.
@@ -65,13 +83,27 @@ class MonteCarloLLM:
                 DEFAULT_SETTINGS["verbose"].
             exploration_weight (float, optional): The exploration weight used in the MCTS algorithm.
                 Defaults to DEFAULT_SETTINGS["exploration_weight"].
+            num_workers (int, optional): The number of independent trees searched concurrently
+                and merged afterwards (root parallelization). Defaults to
+                DEFAULT_SETTINGS["num_workers"].
+            parallel (int, optional): The number of iterations running concurrently on the same
+                tree (tree parallelization with virtual losses). Defaults to
+                DEFAULT_SETTINGS["parallel"].
+            convergence_threshold (float, optional): Stop the search early once the same root
+                child has led for CONVERGENCE_WINDOW iterations and the spread between the
+                highest and lowest mean value of that window is below this; 0 disables the
+                check. Defaults to DEFAULT_SETTINGS["convergence_threshold"].
 
         Returns:
             MCTSResult: The result of the MCTS process, including the answer, the valid path, and
                 the MCTS tree.
         """
-        request_settings["api_base"] = self.api_base
-        request_settings["model"] = self.model_name
+        # build a new dict so that neither the caller's settings nor the defaults are mutated
+        request_settings = {
+            **(DEFAULT_REQUEST_SETTINGS if request_settings is None else request_settings),
+            "api_base": self.api_base,
+            "model": self.model_name,
+        }
 
         # create MCTS tree
         mcts_tree: MCTS = MCTS(
@@ -81,10 +113,17 @@ class MonteCarloLLM:
             max_children=max_children,
             verbose=verbose,
             exploration_weight=exploration_weight,
+            parallel=parallel,
+            convergence_threshold=convergence_threshold,
         )
 
+        if num_workers > 1:
+            answer: str = asyncio.run(mcts_tree.search_root_parallel(num_workers))
+        else:
+            answer = asyncio.run(mcts_tree.search())
+
         return MCTSResult(
-            answer=mcts_tree.search(),
+            answer=answer,
             valid_path=mcts_tree.get_best_path(),
             tree=mcts_tree.get_tree(),
         )
@@ -1,3 +1,8 @@
-from .settings import DEFAULT_REQUEST_SETTINGS, DEFAULT_SETTINGS
+from .settings import (
+    DEFAULT_REQUEST_SETTINGS,
+    DEFAULT_SETTINGS,
+    LOCAL_API_BASES,
+    PHASE_MAX_TOKENS,
+)
 
-__all__ = ["DEFAULT_SETTINGS", "DEFAULT_REQUEST_SETTINGS"]
+__all__ = ["DEFAULT_SETTINGS", "DEFAULT_REQUEST_SETTINGS", "LOCAL_API_BASES", "PHASE_MAX_TOKENS"]
@@ -1,18 +1,38 @@
-import numpy as np
+import math
+from typing import Any, Dict, Tuple
 
-DEFAULT_SETTINGS = {
+DEFAULT_SETTINGS: Dict[str, Any] = {
     "model": "openai/gpt-4o-mini",
     "ollama_api_base": "http://localhost:11434",
     "api_key": "EMPTY",
     "max_children": 3,
-    "exploration_weight": np.sqrt(2),
+    "exploration_weight": math.sqrt(2),
     "iterations": 10,
+    "num_workers": 1,
+    "parallel": 1,
+    "convergence_threshold": 0.0,
     "verbose": True,
 }
 
+# environment variable litellm reads the api_base from, and the fallback used if it is unset,
+# for local inference servers, keyed by the litellm provider prefix of the model name
+LOCAL_API_BASES: Dict[str, Tuple[str, str]] = {
+    "ollama": ("OLLAMA_API_BASE", DEFAULT_SETTINGS["ollama_api_base"]),
+    "ollama_chat": ("OLLAMA_API_BASE", DEFAULT_SETTINGS["ollama_api_base"]),
+    "hosted_vllm": ("HOSTED_VLLM_API_BASE", "http://localhost:8000/v1"),
+    "lm_studio": ("LM_STUDIO_API_BASE", "http://localhost:1234/v1"),
+}
+
 DEFAULT_REQUEST_SETTINGS = {
     "max_tokens": 8_192,
     "temperature": 1.0,
     "top_p": 0.9,
     "seed": 1337,
 }
+
+# upper bounds for the generation length of each batched request type; ratings and feedback are
+# much shorter than refined answers, so their batches do not inherit the global max_tokens
+PHASE_MAX_TOKENS = {
+    "rating": 256,
+    "feedback": 1_024,
+}
@@ -1,17 +1,79 @@
+import asyncio
+import functools
+import json
+import math
+import os
 import warnings
-from typing import Any, Dict, Union
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar, Union, cast
 
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
 import instructor  # noqa: E402
 import litellm  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+from litellm.exceptions import (  # noqa: E402
+    APIConnectionError,
+    InternalServerError,
+    RateLimitError,
+    ServiceUnavailableError,
+    Timeout,
+)
 
+from .config import PHASE_MAX_TOKENS  # noqa: E402
 from .prompts import (  # noqa: E402
     critique_prompt,
+    critique_prompt_prefix,
+    critique_prompt_suffix,
     rating_prompt,
+    rating_prompt_prefix,
+    rating_prompt_suffix,
     refine_prompt,
+    refine_prompt_prefix,
+    refine_prompt_suffix,
+)
+from .utils import (  # noqa: E402
+    BatchingClient,
+    LLMCache,
+    extract_first_number,
+    is_numeric_score,
+    make_cache_key,
+    normalize_rating_score,
+    normalize_rating_scores,
+)
+
+# responses of greedy requests, shared by all searches of the process
+_response_cache = LLMCache(maxsize=4_096)
+
+T = TypeVar("T")
+
+_ROLE_USER = "user"
+
+# transient provider errors that are retried with exponential backoff
+_RETRYABLE_ERRORS = (
+    RateLimitError,
+    APIConnectionError,
+    Timeout,
+    ServiceUnavailableError,
+    InternalServerError,
+)
+_MAX_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 1.0
+
+# asyncio semaphores are bound to the event loop they are first used in, and every call of
+# MonteCarloLLM.generate runs its search in a new loop
+_inflight_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
 )
-from .utils import extract_first_number, normalize_rating_score  # noqa: E402
+
+# concurrent text requests of a loop are collected and sent together (see BatchingClient)
+_batching_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BatchingClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# litellm keeps one pooled HTTP client per API key and base URL, so connections are reused
+# across calls instead of paying a TCP/TLS handshake per request. Set LITELLM_HTTP2=True to
+# multiplex the concurrent requests of a batch over a single HTTP/2 connection.
 
 
 def generate_initial_answer(prompt: str, request_settings: Dict[str, Any]) -> str:
@@ -50,24 +112,11 @@ def generate_rating(
         float: A normalized rating score within the range [0, 0.95].
     """
     rating_response = get_structured_model_response(
-        rating_prompt.format(original_prompt=prompt, improved_answer=answer),
+        rating_prompt.format_map({"original_prompt": prompt, "improved_answer": answer}),
         request_settings=request_settings,
         json_schema=json_schema,
     )
-
-    # fallback
-    if isinstance(rating_response, str):
-        extracted_rating: int = extract_first_number(rating_response)
-        return normalize_rating_score(extracted_rating)
-
-    rating: Union[int, str] = rating_response.rating
-
-    # check type of the rating
-    if not isinstance(rating, (int, str)):
-        rating = str(rating)
-
-    # normalize the rating to be within the range [0, 0.95]
-    return normalize_rating_score(rating)
+    return _parse_rating(rating_response)
 
 
 def generate_feedback(prompt: str, answer: str, request_settings: Dict[str, Any]) -> str:
@@ -84,13 +133,10 @@ def generate_feedback(prompt: str, answer: str, request_settings: Dict[str, Any]
         str: The generated feedback from the model as a string.
     """
     response = get_model_response(
-        critique_prompt.format(original_prompt=prompt, initial_answer=answer), request_settings
+        critique_prompt.format_map({"original_prompt": prompt, "initial_answer": answer}),
+        request_settings,
     )
-
-    if not isinstance(response, str):
-        response = str(response)
-
-    return response
+    return _parse_feedback(response)
 
 
 def generate_improved_version(
@@ -110,19 +156,13 @@ def generate_improved_version(
         str: The improved version of the answer generated by the model.
     """
     improved_response = get_structured_model_response(
-        refine_prompt.format(original_prompt=prompt, previous_answer=answer, feedback=feedback),
+        refine_prompt.format_map(
+            {"original_prompt": prompt, "previous_answer": answer, "feedback": feedback}
+        ),
         request_settings=request_settings,
         json_schema=json_schema,
     )
-    if isinstance(improved_response, str):
-        return improved_response
-
-    response = improved_response.ImprovedText
-
-    if not isinstance(response, str):
-        return str(response)
-
-    return response
+    return _parse_improved_version(improved_response)
 
 
 def get_model_response(prompt: str, request_settings: Dict[str, Any]) -> str:
@@ -136,11 +176,42 @@ def get_model_response(prompt: str, request_settings: Dict[str, Any]) -> str:
     Returns:
         str: The model's response as a string extracted from the first choice.
     """
-    response = litellm.completion(
-        messages=[{"content": prompt, "role": "user"}], **request_settings
-    )
+    return get_model_response_batch([prompt], request_settings)[0]
+
 
-    return str(response["choices"][0]["message"]["content"])
+def get_model_response_batch(prompts: List[str], request_settings: Dict[str, Any]) -> List[str]:
+    """
+    Sends a batch of prompts to the model in a single `litellm.batch_completion` call and
+    retrieves their textual responses.
+
+    Prompts with a cached response are not sent again.
+
+    Args:
+        prompts (List[str]): The prompts to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary shared by all prompts.
+
+    Returns:
+        List[str]: The model's responses, in the order of `prompts`.
+    """
+    cache_keys = [make_cache_key(p, request_settings) for p in prompts]
+    contents: List[Optional[str]] = [_response_cache.lookup(key) for key in cache_keys]
+    missing: List[int] = [i for i, content in enumerate(contents) if content is None]
+
+    if missing:
+        responses = litellm.batch_completion(
+            messages=[_build_messages(prompts[i]) for i in missing],
+            **request_settings,
+        )
+        for i, response in zip(missing, responses):
+            # failed requests are returned in place of their response
+            if isinstance(response, Exception):
+                raise response
+
+            content = str(response["choices"][0]["message"]["content"])
+            _response_cache.update(cache_keys[i], content)
+            contents[i] = content
+
+    return [str(content) for content in contents]
 
 
 def get_structured_model_response(
@@ -159,23 +230,667 @@ def get_structured_model_response(
              Typically, this will be an instance of the schema model.
              If validation fails, the raw response string is returned as a fallback.
     """
-    client = instructor.from_litellm(litellm.completion)
+    cache_key = make_cache_key(prompt, request_settings, json_schema)
+    cached_response: Any = _response_cache.lookup(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    client = _client()
 
     try:
         response = client.create(
-            response_model=json_schema,
-            messages=[{"content": prompt, "role": "user"}],
+            response_model=_response_model_of(json_schema),
+            messages=_build_messages(prompt),
             **request_settings,
         )
+        # raw fallback responses are never cached
+        _response_cache.update(cache_key, response)
         return response
     except Exception as _:
         try:
             raw_response = client.create(
                 response_model=None,  # request raw output without schema validation
-                messages=[{"content": prompt, "role": "user"}],
+                messages=_build_messages(prompt),
                 **request_settings,
             )
             return raw_response["choices"][0]["message"]["content"]
         except Exception as e:
             print(f"Error retrieving raw response as fallback: {e}")
             raise
+
+
+async def agenerate_rating(
+    prompt: str, answer: str, request_settings: Dict[str, Any], json_schema: Any
+) -> float:
+    """
+    Asynchronous counterpart of `generate_rating`.
+
+    Args:
+        prompt (str): The original input prompt to guide the model's response.
+        answer (str): The generated or improved answer to be rated.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API key, model name, and decoding parameters.
+
+    Returns:
+        float: A normalized rating score within the range [0, 0.95].
+    """
+    rating_response = await aget_structured_model_response(
+        rating_prompt.format_map({"original_prompt": prompt, "improved_answer": answer}),
+        request_settings=request_settings,
+        json_schema=json_schema,
+        stop_at_json_end=True,
+    )
+    return _parse_rating(rating_response)
+
+
+async def agenerate_feedback(prompt: str, answer: str, request_settings: Dict[str, Any]) -> str:
+    """
+    Asynchronous counterpart of `generate_feedback`.
+
+    Args:
+        prompt (str): The original input prompt that guided the initial response.
+        answer (str): The answer to be critiqued or evaluated.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API endpoint, model name, and decoding parameters.
+
+    Returns:
+        str: The generated feedback from the model as a string.
+    """
+    response = await aget_model_response(
+        critique_prompt.format_map({"original_prompt": prompt, "initial_answer": answer}),
+        request_settings,
+    )
+    return _parse_feedback(response)
+
+
+async def agenerate_improved_version(
+    prompt: str, answer: str, feedback: str, request_settings: Dict[str, Any], json_schema: Any
+) -> str:
+    """
+    Asynchronous counterpart of `generate_improved_version`.
+
+    Args:
+        prompt (str): The original input prompt that guided the generation of the answer.
+        answer (str): The initial answer to be improved.
+        feedback (str): Feedback provided for refining the answer.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API endpoint, model name, and decoding parameters.
+
+    Returns:
+        str: The improved version of the answer generated by the model.
+    """
+    improved_response = await aget_structured_model_response(
+        refine_prompt.format_map(
+            {"original_prompt": prompt, "previous_answer": answer, "feedback": feedback}
+        ),
+        request_settings=request_settings,
+        json_schema=json_schema,
+    )
+    return _parse_improved_version(improved_response)
+
+
+async def aget_model_response(prompt: str, request_settings: Dict[str, Any]) -> str:
+    """
+    Asynchronous counterpart of `get_model_response`.
+
+    Args:
+        prompt (str): The input prompt or query to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary.
+
+    Returns:
+        str: The model's response as a string extracted from the first choice.
+    """
+    cache_key = make_cache_key(prompt, request_settings)
+    cached_response: Optional[str] = _response_cache.lookup(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    content = await _arequest(
+        lambda: _batching_client().complete(_build_messages(prompt), request_settings)
+    )
+
+    _response_cache.update(cache_key, content)
+    return content
+
+
+async def aget_structured_model_response(
+    prompt: str,
+    request_settings: Dict[str, Any],
+    json_schema: Any,
+    stop_at_json_end: bool = False,
+) -> Any:
+    """
+    Asynchronous counterpart of `get_structured_model_response`.
+
+    The raw fallback response is streamed. With `stop_at_json_end`, the stream is cut off as
+    soon as it forms a complete JSON object, so the server stops decoding instead of
+    generating up to `max_tokens`.
+
+    Args:
+        prompt (str): The input prompt or query to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary.
+        json_schema (Any): A JSON schema for the structured output.
+        stop_at_json_end (bool, optional): Whether to cut the raw fallback off after a leading
+            JSON object. Only safe if nothing after the object is needed. Defaults to False.
+
+    Returns:
+        Any: The structured response validated against the provided JSON schema.
+             If validation fails, the raw response string is returned as a fallback.
+    """
+    cache_key = make_cache_key(prompt, request_settings, json_schema)
+    cached_response: Any = _response_cache.lookup(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    client = _async_client()
+
+    try:
+        response = await _arequest(
+            lambda: client.create(
+                response_model=_response_model_of(json_schema),
+                messages=_build_messages(prompt),
+                **request_settings,
+            )
+        )
+        # raw fallback responses are never cached
+        _response_cache.update(cache_key, response)
+        return response
+    except Exception as _:
+        try:
+            # request raw output without schema validation
+            return await _arequest(
+                lambda: _astream_raw_response(prompt, request_settings, stop_at_json_end)
+            )
+        except Exception as e:
+            print(f"Error retrieving raw response as fallback: {e}")
+            raise
+
+
+async def agenerate_rating_batch(
+    prompt: str, answers: List[str], request_settings: Dict[str, Any], json_schema: Any
+) -> List[float]:
+    """
+    Generates normalized rating scores for several answers to the same prompt in one batch.
+
+    The generation length is capped at PHASE_MAX_TOKENS["rating"].
+
+    Args:
+        prompt (str): The original input prompt to guide the model's response.
+        answers (List[str]): The answers to be rated.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API key, model name, and decoding parameters.
+        json_schema (Any): A JSON schema for the structured output.
+
+    Returns:
+        List[float]: One normalized rating score per answer, in the order of `answers`.
+    """
+    # the shared prefix with the original prompt is formatted once for the whole batch
+    prefix = rating_prompt_prefix.format_map({"original_prompt": prompt})
+    rating_responses = await aget_structured_model_response_batch(
+        [prefix + rating_prompt_suffix.format_map({"improved_answer": a}) for a in answers],
+        request_settings=_cap_max_tokens(request_settings, PHASE_MAX_TOKENS["rating"]),
+        json_schema=json_schema,
+        stop_at_json_end=True,
+    )
+    ratings = normalize_rating_scores([_rating_value(r) for r in rating_responses])
+    return [float(rating) for rating in ratings]
+
+
+async def agenerate_feedback_batch(
+    prompt: str, answers: List[str], request_settings: Dict[str, Any]
+) -> List[str]:
+    """
+    Generates feedback for several answers to the same prompt in one batch.
+
+    The generation length is capped at PHASE_MAX_TOKENS["feedback"].
+
+    Args:
+        prompt (str): The original input prompt that guided the initial responses.
+        answers (List[str]): The answers to be critiqued or evaluated.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API endpoint, model name, and decoding parameters.
+
+    Returns:
+        List[str]: One feedback string per answer, in the order of `answers`.
+    """
+    prefix = critique_prompt_prefix.format_map({"original_prompt": prompt})
+    responses = await aget_model_response_batch(
+        [prefix + critique_prompt_suffix.format_map({"initial_answer": a}) for a in answers],
+        _cap_max_tokens(request_settings, PHASE_MAX_TOKENS["feedback"]),
+    )
+    return [_parse_feedback(r) for r in responses]
+
+
+async def agenerate_improved_version_batch(
+    prompt: str,
+    answers: List[str],
+    feedbacks: List[str],
+    request_settings: Dict[str, Any],
+    json_schema: Any,
+) -> List[str]:
+    """
+    Generates improved versions of several answers, each based on its own feedback, in one batch.
+
+    Args:
+        prompt (str): The original input prompt that guided the generation of the answers.
+        answers (List[str]): The answers to be improved.
+        feedbacks (List[str]): Feedback for each answer, aligned with `answers`.
+        request_settings (Dict[str, Any]): A dictionary containing configuration settings
+            for the model, such as API endpoint, model name, and decoding parameters.
+        json_schema (Any): A JSON schema for the structured output.
+
+    Returns:
+        List[str]: One improved answer per input answer, in the order of `answers`.
+    """
+    prefix = refine_prompt_prefix.format_map({"original_prompt": prompt})
+    improved_responses = await aget_structured_model_response_batch(
+        [
+            prefix + refine_prompt_suffix.format_map({"previous_answer": a, "feedback": f})
+            for a, f in zip(answers, feedbacks)
+        ],
+        request_settings=request_settings,
+        json_schema=json_schema,
+    )
+    return [_parse_improved_version(r) for r in improved_responses]
+
+
+async def aget_model_response_batch(
+    prompts: List[str], request_settings: Dict[str, Any]
+) -> List[str]:
+    """
+    Sends a batch of prompts to the model at once and retrieves their textual responses.
+
+    All requests of the batch are in flight together, so a server with continuous batching
+    (e.g. vLLM) schedules them into the same decoding steps.
+
+    Args:
+        prompts (List[str]): The prompts to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary shared by all prompts.
+
+    Returns:
+        List[str]: The model's responses, in the order of `prompts`.
+    """
+    return list(await asyncio.gather(*(aget_model_response(p, request_settings) for p in prompts)))
+
+
+async def aget_structured_model_response_batch(
+    prompts: List[str],
+    request_settings: Dict[str, Any],
+    json_schema: Any,
+    stop_at_json_end: bool = False,
+) -> List[Any]:
+    """
+    Sends a batch of prompts to the model at once and retrieves their structured responses.
+
+    Args:
+        prompts (List[str]): The prompts to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary shared by all prompts.
+        json_schema (Any): A JSON schema for the structured output.
+        stop_at_json_end (bool, optional): Whether to cut raw fallbacks off after a leading
+            JSON object. Defaults to False.
+
+    Returns:
+        List[Any]: The structured (or raw fallback) responses, in the order of `prompts`.
+    """
+    return list(
+        await asyncio.gather(
+            *(
+                aget_structured_model_response(p, request_settings, json_schema, stop_at_json_end)
+                for p in prompts
+            )
+        )
+    )
+
+
+async def _arequest(request: Callable[[], Awaitable[T]]) -> T:
+    """
+    Runs a model request while limiting the number of requests in flight and retrying
+    transient provider errors with exponential backoff.
+
+    Args:
+        request (Callable[[], Awaitable[T]]): Starts the request; called once per attempt.
+
+    Returns:
+        T: The result of the request.
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            async with _inflight_semaphore():
+                return await request()
+        except _RETRYABLE_ERRORS:
+            if attempt == _MAX_ATTEMPTS - 1:
+                raise
+
+        # the slot is released while waiting, so other requests can proceed
+        await asyncio.sleep(_RETRY_BASE_DELAY * 2**attempt)
+
+    raise AssertionError("unreachable")
+
+
+def _inflight_semaphore() -> asyncio.Semaphore:
+    """
+    Returns the semaphore that limits the requests in flight in the running event loop.
+
+    The limit is read from the LLM_INFLIGHT_LIMIT environment variable (default: 16).
+
+    Returns:
+        asyncio.Semaphore: The semaphore of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _inflight_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(int(os.getenv("LLM_INFLIGHT_LIMIT", "16")))
+        _inflight_semaphores[loop] = semaphore
+
+    return semaphore
+
+
+def _batching_client() -> BatchingClient:
+    """
+    Returns the client that batches the text requests of the running event loop.
+
+    Returns:
+        BatchingClient: The batching client of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _batching_clients.get(loop)
+    if client is None:
+        client = BatchingClient()
+        _batching_clients[loop] = client
+
+    return client
+
+
+async def _astream_raw_response(
+    prompt: str, request_settings: Dict[str, Any], stop_at_json_end: bool = False
+) -> str:
+    """
+    Streams a raw model response, optionally closing the stream early once a leading JSON
+    object is complete.
+
+    Args:
+        prompt (str): The input prompt or query to be sent to the model.
+        request_settings (Dict[str, Any]): Configuration dictionary.
+        stop_at_json_end (bool, optional): Whether to stop after a leading JSON object.
+            Defaults to False.
+
+    Returns:
+        str: The streamed response, or only the JSON object if it started with one and
+             `stop_at_json_end` is set.
+    """
+    stream = await litellm.acompletion(
+        messages=_build_messages(prompt), stream=True, **request_settings
+    )
+
+    scanner = _JsonObjectScanner()
+    parts: List[str] = []
+    try:
+        async for chunk in stream:
+            content: str = chunk.choices[0].delta.content or ""
+            end: Optional[int] = scanner.feed(content) if stop_at_json_end else None
+            if end is not None:
+                parts.append(content[:end])
+                break
+            parts.append(content)
+    finally:
+        # closing the stream aborts the generation on the server
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    return "".join(parts)
+
+
+class _JsonObjectScanner:
+    """
+    Incrementally detects the end of a JSON object at the start of a streamed text.
+
+    Braces inside JSON strings are ignored. Texts that do not start with `{` (after leading
+    whitespace) are never reported as complete.
+    """
+
+    def __init__(self) -> None:
+        self._depth: int = 0
+        self._started: bool = False
+        self._rejected: bool = False
+        self._in_string: bool = False
+        self._escaped: bool = False
+
+    def feed(self, text: str) -> Optional[int]:
+        """
+        Consumes the next piece of the text.
+
+        Args:
+            text (str): The next piece of the streamed text.
+
+        Returns:
+            Optional[int]: The position in `text` right after the closing brace of the object,
+                or None if the object is not complete yet (or the text is no JSON object).
+        """
+        if self._rejected:
+            return None
+
+        for i, char in enumerate(text):
+            if not self._started:
+                if char.isspace():
+                    continue
+                if char != "{":
+                    self._rejected = True
+                    return None
+                self._started = True
+                self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1
+
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _client() -> instructor.Instructor:
+    """
+    Returns the instructor client for synchronous structured requests.
+
+    The client only wraps `litellm.completion`, so it is built once, on the first structured
+    request, and shared afterwards.
+
+    Returns:
+        instructor.Instructor: The shared client.
+    """
+    return instructor.from_litellm(litellm.completion)
+
+
+@functools.lru_cache(maxsize=1)
+def _async_client() -> instructor.AsyncInstructor:
+    """
+    Returns the instructor client for asynchronous structured requests.
+
+    Returns:
+        instructor.AsyncInstructor: The shared client.
+    """
+    # the overloads of from_litellm do not recognize litellm.acompletion as a coroutine function
+    return cast(instructor.AsyncInstructor, instructor.from_litellm(litellm.acompletion))
+
+
+@functools.lru_cache(maxsize=128)
+def _response_model_of(json_schema: Any) -> Any:
+    """
+    Returns the instructor response model for a schema, built once per schema class.
+
+    instructor wraps a plain Pydantic model in a new subclass on every request, which also
+    defeats its own cache of the generated tool schema. Models that are already wrapped are
+    used as they are.
+
+    Args:
+        json_schema (Any): A JSON schema for the structured output.
+
+    Returns:
+        Any: The wrapped response model, or the schema itself if it is not a Pydantic model.
+    """
+    if isinstance(json_schema, type) and issubclass(json_schema, BaseModel):
+        return instructor.openai_schema(json_schema)
+
+    return json_schema
+
+
+def _build_messages(prompt: str) -> List[Any]:
+    """
+    Builds the chat messages for a single user prompt.
+
+    A new list is returned for every request, since instructor appends retry messages to it.
+
+    Args:
+        prompt (str): The input prompt or query to be sent to the model.
+
+    Returns:
+        List[Any]: The messages of the request.
+    """
+    return [{"content": prompt, "role": _ROLE_USER}]
+
+
+def _cap_max_tokens(request_settings: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+    """
+    Returns a copy of the request settings whose `max_tokens` does not exceed a limit.
+
+    A missing or None `max_tokens` (no limit) is replaced by the limit.
+
+    Args:
+        request_settings (Dict[str, Any]): Configuration dictionary.
+        max_tokens (int): The upper bound for the generation length.
+
+    Returns:
+        Dict[str, Any]: The request settings with the capped `max_tokens`.
+    """
+    current: Optional[int] = request_settings.get("max_tokens")
+    return {
+        **request_settings,
+        "max_tokens": max_tokens if current is None else min(current, max_tokens),
+    }
+
+
+def _parse_rating(rating_response: Any) -> float:
+    """
+    Converts a structured (or raw fallback) rating response into a normalized score.
+
+    Args:
+        rating_response (Any): The response returned for a rating prompt.
+
+    Returns:
+        float: A normalized rating score within the range [0, 0.95].
+    """
+    # normalize the rating to be within the range [0, 0.95]
+    return normalize_rating_score(_rating_value(rating_response))
+
+
+def _rating_value(rating_response: Any) -> Union[int, str]:
+    """
+    Extracts the raw rating from a structured (or raw fallback) rating response.
+
+    Args:
+        rating_response (Any): The response returned for a rating prompt.
+
+    Returns:
+        Union[int, str]: The rating before normalization.
+
+    Raises:
+        ValueError: If the structured rating is not numeric.
+    """
+    # fallback
+    if isinstance(rating_response, str):
+        json_rating: Optional[int] = _extract_json_rating(rating_response)
+        if json_rating is not None:
+            return json_rating
+
+        return extract_first_number(rating_response)
+
+    rating: Union[int, str] = rating_response.rating
+
+    # check type of the rating
+    if not isinstance(rating, (int, str)):
+        rating = str(rating)
+
+    if isinstance(rating, str) and not is_numeric_score(rating):
+        raise ValueError(f"Input score must be a numeric string. Found: {rating}")
+
+    return rating
+
+
+def _extract_json_rating(response: str) -> Optional[int]:
+    """
+    Extracts the rating from a raw response that is a JSON object with a numeric `rating`.
+
+    Unlike scanning for the first number, this does not pick up numbers that appear in the
+    justification before the rating.
+
+    Args:
+        response (str): The raw response returned for a rating prompt.
+
+    Returns:
+        Optional[int]: The rating, or None if the response is not such a JSON object.
+    """
+    try:
+        parsed: Any = json.loads(response)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(parsed, dict):
+        return None
+
+    rating: Any = parsed.get("rating")
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+        return None
+
+    # json.loads accepts NaN and Infinity, which have no integer value
+    if not math.isfinite(rating):
+        return None
+
+    return int(rating)
+
+
+def _parse_feedback(response: Any) -> str:
+    """
+    Converts a feedback response into a string.
+
+    Args:
+        response (Any): The response returned for a critique prompt.
+
+    Returns:
+        str: The feedback as a string.
+    """
+    if isinstance(response, str):
+        return response
+
+    return str(response)
+
+
+def _parse_improved_version(improved_response: Any) -> str:
+    """
+    Extracts the improved answer from a structured (or raw fallback) response.
+
+    Args:
+        improved_response (Any): The response returned for a refine prompt.
+
+    Returns:
+        str: The improved version of the answer.
+    """
+    if isinstance(improved_response, str):
+        return improved_response
+
+    response = improved_response.ImprovedText
+
+    if not isinstance(response, str):
+        return str(response)
+
+    return response
@@ -1,15 +1,31 @@
+import asyncio
+import copy
+import hashlib
+import math
 import random
-from typing import Any, Dict, List, Optional
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 import numpy as np
+import numpy.typing as npt
 
 from .inference import (
-    generate_feedback,
-    generate_improved_version,
+    agenerate_feedback_batch,
+    agenerate_improved_version_batch,
+    agenerate_rating_batch,
     generate_initial_answer,
-    generate_rating,
 )
 from .prompts import ImprovedResponse, RatingResponse
+from .utils import uct_argmax
+
+# penalty applied to nodes on the path of an in-flight iteration during tree parallelization
+VIRTUAL_LOSS: int = 1
+
+# number of consecutive iterations considered by the convergence check of the search
+CONVERGENCE_WINDOW: int = 3
+
+# below this number of children, scoring them one by one is faster than NumPy dispatch
+VECTORIZE_MIN_CHILDREN: int = 8
 
 
 class Node:
@@ -29,8 +45,28 @@ class Node:
         visits (int): The number of times this node has been visited.
         value (float): The accumulated value of this node.
         level (int): The depth of the node in the tree, with the root node at level 0.
+        lock (asyncio.Lock): Serializes concurrent expansions of this node.
     """
 
+    # a search creates a node per refined answer, so nodes skip the per-instance __dict__
+    __slots__ = (
+        "original_prompt",
+        "answer",
+        "parent",
+        "max_children",
+        "exploration_weight",
+        "children",
+        "_visits",
+        "_value",
+        "level",
+        "lock",
+        "_child_visits",
+        "_child_values",
+        "_stats_owner",
+        "_child_index",
+        "_exploration_factor",
+    )
+
     def __init__(
         self,
         original_prompt: str,
@@ -47,11 +83,46 @@ class Node:
         self.exploration_weight: float = exploration_weight
 
         self.children: List["Node"] = []
-        self.visits: int = 1
-        self.value: float = 0.0  # accumulated value
+        self._visits: int = 1
+        self._value: float = 0.0  # accumulated value
 
         self.level: int = 0 if parent is None else parent.level + 1
 
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+        # statistics of the children as parallel arrays, kept in sync by the setters of
+        # `visits` and `value` so that `best_child` can score all children at once
+        self._child_visits: npt.NDArray[np.float64] = np.zeros(max_children, dtype=np.float64)
+        self._child_values: npt.NDArray[np.float64] = np.zeros(max_children, dtype=np.float64)
+        self._stats_owner: Optional["Node"] = None  # node that holds this node's statistics
+        self._child_index: int = -1  # position in the arrays of `_stats_owner`
+
+        # exploration_weight * sqrt(ln(visits)), reset whenever the visits change
+        self._exploration_factor: Optional[float] = None
+
+    @property
+    def visits(self) -> int:
+        """The number of times this node has been visited."""
+        return self._visits
+
+    @visits.setter
+    def visits(self, visits: int) -> None:
+        self._visits = visits
+        self._exploration_factor = None
+        if self._stats_owner is not None:
+            self._stats_owner._child_visits[self._child_index] = visits
+
+    @property
+    def value(self) -> float:
+        """The accumulated value of this node."""
+        return self._value
+
+    @value.setter
+    def value(self, value: float) -> None:
+        self._value = value
+        if self._stats_owner is not None:
+            self._stats_owner._child_values[self._child_index] = value
+
     def is_fully_expanded(self) -> bool:
         """
         Checks if the node is fully expanded, meaning it has the maximum number of children.
@@ -65,23 +136,45 @@ class Node:
         """
         Selects the best child of the current node based on the UCT.
 
+        Nodes with many children are scored in one pass over the parallel statistic arrays
+        (compiled with Numba if it is installed, vectorized NumPy otherwise); for the usual
+        handful of children a scalar loop is faster.
+
         Returns:
             Node: The child node with the highest computed weight.
         """
-        choices_weights: List[float] = []
+        num_children: int = len(self.children)
+
+        # the parent-only part of the exploration term, c * sqrt(ln(N)), is shared by all
+        # children, leaving one sqrt and one division per child
+        exploration_factor: Optional[float] = self._exploration_factor
+        if exploration_factor is None:
+            exploration_factor = self.exploration_weight * math.sqrt(math.log(self.visits))
+            self._exploration_factor = exploration_factor
+
+        if num_children >= VECTORIZE_MIN_CHILDREN:
+            index: int = uct_argmax(
+                self._child_visits[:num_children],
+                self._child_values[:num_children],
+                exploration_factor,
+            )
+            return self.children[index]
+
+        # track the running maximum instead of materializing all weights
+        best: Node = self.children[0]
+        best_weight: float = -math.inf
         for child in self.children:
-            if child.visits == 0:
-                weight: float = float("inf")  # explore unvisited nodes first
+            if child._visits == 0:
+                weight: float = math.inf  # explore unvisited nodes first
             else:
-                exploitation_term: float = child.value / child.visits
-                exploration_term: float = self.exploration_weight * np.sqrt(
-                    np.log(self.visits) / child.visits
-                )
+                exploitation_term: float = child._value / child._visits
+                exploration_term: float = exploration_factor / math.sqrt(child._visits)
                 weight = exploitation_term + exploration_term
 
-            choices_weights.append(weight)
+            if weight > best_weight:
+                best, best_weight = child, weight
 
-        return self.children[np.argmax(choices_weights)]
+        return best
 
     def most_visited_child(self) -> "Node":
         """
@@ -99,7 +192,17 @@ class Node:
         Args:
             child_node (Node): The child node to add.
         """
+        index: int = len(self.children)
+        if index >= len(self._child_visits):
+            capacity: int = max(1, 2 * len(self._child_visits))
+            self._child_visits = np.resize(self._child_visits, capacity)
+            self._child_values = np.resize(self._child_values, capacity)
+
         self.children.append(child_node)
+        child_node._stats_owner = self
+        child_node._child_index = index
+        self._child_visits[index] = child_node.visits
+        self._child_values[index] = child_node.value
 
     def __str__(self) -> str:
         return (
@@ -124,6 +227,10 @@ class MCTS:
         request_settings (Dict[str, Any]): Configuration settings for the underlying model.
         verbose (bool): Whether to print progress information during the search.
         exploration_weight (float): The weight used to balance exploration and exploitation.
+        parallel (int): The number of iterations running concurrently on the shared tree.
+        convergence_threshold (float): Stop the search once the same root child has led for
+            CONVERGENCE_WINDOW iterations and the spread between the highest and lowest mean
+            value of that window is below this; 0 disables it.
         initial_answer (str): The initial answer generated from the input prompt.
         root (Node): The root node of the search tree.
     """
@@ -136,6 +243,8 @@ class MCTS:
         max_children: int,
         verbose: bool,
         exploration_weight: float,
+        parallel: int = 1,
+        convergence_threshold: float = 0.0,
     ) -> None:
         self.original_prompt: str = original_prompt
         self.iterations: int = iterations
@@ -143,6 +252,15 @@ class MCTS:
         self.request_settings: Dict[str, Any] = request_settings
         self.verbose: bool = verbose
         self.exploration_weight: float = exploration_weight
+        self.parallel: int = max(1, parallel)
+        self.convergence_threshold: float = convergence_threshold
+
+        # per-instance RNG seeded like the model requests, so searches are reproducible and
+        # root parallel workers do not share the global random state
+        self._rng: random.Random = random.Random(request_settings.get("seed"))
+
+        # ratings of already simulated answers, keyed by the SHA-1 digest of the answer
+        self._rating_cache: Dict[bytes, float] = {}
 
         self.initial_answer: str = generate_initial_answer(original_prompt, request_settings)
         self.root: Node = Node(
@@ -154,37 +272,242 @@ class MCTS:
             exploration_weight=self.exploration_weight,
         )
 
-    def search(self) -> str:
+    async def search(self) -> str:
         """
         Executes the MCTS search process and returns the best answer.
 
+        Newly expanded siblings are simulated together (leaf parallelization) and each
+        reward is backpropagated from its own node.
+
         Returns:
             str: The best answer found during the search.
         """
-        for i in range(self.iterations):
-            self.print_to_terminal(f"Iteration {i + 1}/{self.iterations}")
+        await self._run_iterations(self.iterations)
+        return self._best_answer()
+
+    async def search_root_parallel(self, num_workers: int) -> str:
+        """
+        Executes the MCTS search on several independent trees concurrently (root
+        parallelization) and merges them into a single tree.
+
+        Each worker grows its own tree from the initial answer with a distinct seed and an
+        equal share of the iterations. Afterwards, the root children of all trees are merged,
+        with children holding identical answers combined by summing their statistics, and
+        the most visited child of the merged root wins the vote. Workers run their full share,
+        since a leader that is decided within one tree can still lose the merged vote.
+
+        Args:
+            num_workers (int): The number of independent trees to grow.
+
+        Returns:
+            str: The best answer found during the search.
+        """
+        num_workers = max(1, min(num_workers, self.iterations))
+        workers: List[MCTS] = [self._spawn_worker(i) for i in range(num_workers)]
+
+        base, remainder = divmod(self.iterations, num_workers)
+        await asyncio.gather(
+            *(
+                worker._run_iterations(base + (1 if i < remainder else 0), stop_when_decided=False)
+                for i, worker in enumerate(workers)
+            )
+        )
+
+        self.root = self._merge_roots([worker.root for worker in workers])
+        return self._best_answer()
+
+    async def _run_iterations(self, iterations: int, stop_when_decided: bool = True) -> None:
+        """
+        Runs the select, expand, simulate and backpropagate loop on the tree of this instance.
 
-            node: Node = self.select(self.root)
-            self.print_to_terminal(f"Selected node from level: {node.level}")
+        With `parallel` > 1, several iterations traverse the shared tree concurrently (tree
+        parallelization); virtual losses steer them towards distinct paths.
 
+        Args:
+            iterations (int): The number of iterations to perform.
+            stop_when_decided (bool, optional): Whether to stop once the most visited root
+                child can no longer change. Defaults to True.
+        """
+        started: int = 0
+        in_flight: int = 0
+        stop: bool = False
+        top_child_means: Deque[Tuple[Node, float]] = deque(maxlen=CONVERGENCE_WINDOW)
+
+        async def worker() -> None:
+            nonlocal started, in_flight, stop
+            while started < iterations and not stop:
+                started += 1
+                self.print_to_terminal(f"Iteration {started}/{iterations}")
+
+                in_flight += 1
+                try:
+                    await self._run_iteration()
+                finally:
+                    in_flight -= 1
+
+                if not stop and self._should_stop(
+                    iterations - started + in_flight, top_child_means, stop_when_decided
+                ):
+                    stop = True
+                    self.print_to_terminal(f"Stopping early after {started} iterations")
+
+        await asyncio.gather(*(worker() for _ in range(min(self.parallel, iterations))))
+
+    def _should_stop(
+        self,
+        remaining_iterations: int,
+        top_child_means: Deque[Tuple[Node, float]],
+        stop_when_decided: bool = True,
+    ) -> bool:
+        """
+        Checks whether the remaining iterations can be skipped.
+
+        The search stops if no remaining iteration can change the most visited root child, as
+        one iteration adds at most `max_children` visits to a root child. With a positive
+        `convergence_threshold`, it also stops once the same root child has led for
+        CONVERGENCE_WINDOW iterations while its mean value changed by less than the threshold.
+
+        Args:
+            remaining_iterations (int): The number of iterations not yet completed.
+            top_child_means (Deque[Tuple[Node, float]]): The leading root child and its mean
+                value after each of the latest iterations; updated by this method.
+            stop_when_decided (bool, optional): Whether to stop once the most visited root
+                child can no longer change. Defaults to True.
+
+        Returns:
+            bool: True if the search can stop, False otherwise.
+        """
+        if not self.root.is_fully_expanded() or len(self.root.children) < 2:
+            return False
+
+        runner_up, leader = sorted(self.root.children, key=lambda child: child.visits)[-2:]
+        decided: bool = leader.visits - runner_up.visits > remaining_iterations * self.max_children
+        if stop_when_decided and decided:
+            return True
+
+        if self.convergence_threshold <= 0:
+            return False
+
+        top_child_means.append((leader, leader.value / leader.visits))
+        if len(top_child_means) < CONVERGENCE_WINDOW:
+            return False
+
+        if any(node is not leader for node, _ in top_child_means):
+            return False
+
+        means: List[float] = [mean for _, mean in top_child_means]
+        return max(means) - min(means) < self.convergence_threshold
+
+    async def _run_iteration(self) -> None:
+        """
+        Performs a single select, expand, simulate and backpropagate iteration.
+        """
+        node: Node = self.select(self.root)
+        self.print_to_terminal(f"Selected node from level: {node.level}")
+
+        try:
+            leaves: List[Node] = [node]
             if not node.is_fully_expanded():
                 self.print_to_terminal(f"Expand node at level: {node.level}")
-                node = self.expand(node)
+                leaves = await self.expand(node)
+
+            rewards: List[float] = await self.simulate_batch(leaves)
+        finally:
+            if self.parallel > 1:
+                self.revert_virtual_loss(node)
 
-            reward: float = self.simulate(node)
+        for leaf, reward in zip(leaves, rewards):
             self.print_to_terminal(f"Simulated reward: {reward}")
-            self.backpropagate(node, reward)
+            self.backpropagate(leaf, reward)
 
+    def _best_answer(self) -> str:
+        """
+        Returns the answer of the most visited child of the root node.
+
+        Returns:
+            str: The best answer found during the search.
+        """
         best_node: Node = self.root.most_visited_child()
         self.print_to_terminal(
             f"Best node has {best_node.visits} visits and is at level {best_node.level}"
         )
         return best_node.answer
 
+    def _spawn_worker(self, index: int) -> "MCTS":
+        """
+        Creates a shallow copy of this instance with its own root node and seed.
+
+        Args:
+            index (int): The index of the worker, used to derive a distinct seed.
+
+        Returns:
+            MCTS: The worker instance.
+        """
+        worker: MCTS = copy.copy(self)
+        worker.request_settings = dict(self.request_settings)
+        if worker.request_settings.get("seed") is not None:
+            worker.request_settings["seed"] += index
+        worker._rng = random.Random(worker.request_settings.get("seed"))
+
+        worker.root = Node(
+            original_prompt=self.original_prompt,
+            answer=self.initial_answer,
+            max_children=self.max_children,
+            parent=None,
+            level=0,
+            exploration_weight=self.exploration_weight,
+        )
+        return worker
+
+    def _merge_roots(self, roots: List[Node]) -> Node:
+        """
+        Merges the trees of several root parallel workers into a single tree.
+
+        Root children with identical answers are combined into one node by summing their
+        visits and values and adopting the children of both.
+
+        Args:
+            roots (List[Node]): The root nodes of the worker trees.
+
+        Returns:
+            Node: The root node of the merged tree.
+        """
+        merged_root: Node = Node(
+            original_prompt=self.original_prompt,
+            answer=self.initial_answer,
+            max_children=self.max_children,
+            parent=None,
+            level=0,
+            exploration_weight=self.exploration_weight,
+        )
+        merged_root.visits = sum(root.visits for root in roots)
+        merged_root.value = sum(root.value for root in roots)
+
+        by_answer: Dict[str, Node] = {}
+        for root in roots:
+            for child in root.children:
+                existing: Optional[Node] = by_answer.get(child.answer)
+                if existing is None:
+                    child.parent = merged_root
+                    merged_root.add_child(child)
+                    by_answer[child.answer] = child
+                    continue
+
+                existing.visits += child.visits
+                existing.value += child.value
+                for grandchild in child.children:
+                    grandchild.parent = existing
+                    existing.add_child(grandchild)
+
+        return merged_root
+
     def select(self, node: Node) -> Node:
         """
         Selects a node to expand or simulate based on the exploration and exploitation weights.
 
+        With `parallel` > 1, a virtual loss is added to every node on the selected path so that
+        concurrent iterations prefer other paths until `revert_virtual_loss` is called.
+
         Args:
             node (Node): The root node from which to begin the selection.
 
@@ -193,48 +516,72 @@ class MCTS:
         """
         while node.is_fully_expanded() and node.children:
             node = node.best_child()
+            if self.parallel > 1:
+                node.visits += VIRTUAL_LOSS
+                node.value -= VIRTUAL_LOSS
         return node
 
-    def expand(self, node: Node) -> Node:
+    def revert_virtual_loss(self, node: Node) -> None:
+        """
+        Removes the virtual loss added by `select` from the path between a node and the root.
+
+        Args:
+            node (Node): The node returned by `select`.
+        """
+        current: Optional[Node] = node
+        while current is not None and current.parent is not None:
+            current.visits -= VIRTUAL_LOSS
+            current.value += VIRTUAL_LOSS
+            current = current.parent
+
+    async def expand(self, node: Node) -> List[Node]:
         """
         Expands the current node by creating new child nodes and assigning answers to them.
 
+        The children are refined in two batched phases: the feedback for all new children is
+        requested at once, followed by all improved versions. The children are only attached
+        once they are refined, so concurrent iterations never select a half-built child.
+
         Args:
             node (Node): The node to expand.
 
         Returns:
-            Node: A randomly selected child node after expansion.
-        """
-        for j in range(self.max_children - len(node.children)):  # expand max_children nodes
-            # create and add child node
-            child_node: Node = Node(
-                original_prompt=self.original_prompt,
-                answer=node.answer,  # will be later updated with the model
-                parent=node,
-                max_children=self.max_children,
-                level=node.level + 1,
-                exploration_weight=self.exploration_weight,
-            )
-            node.add_child(child_node)
+            List[Node]: The newly created child nodes, or a random existing child if the node
+                was fully expanded by a concurrent iteration in the meantime.
+        """
+        async with node.lock:
+            if node.is_fully_expanded():
+                return [self._rng.choice(node.children)]
 
-            feedback: str = generate_feedback(
+            answers: List[str] = [node.answer] * (self.max_children - len(node.children))
+            feedbacks: List[str] = await agenerate_feedback_batch(
                 prompt=self.original_prompt,
-                answer=child_node.answer,
+                answers=answers,
                 request_settings=self.request_settings,
             )
-
-            improved_version: str = generate_improved_version(
+            improved_versions: List[str] = await agenerate_improved_version_batch(
                 prompt=self.original_prompt,
-                answer=child_node.answer,
-                feedback=feedback,
+                answers=answers,
+                feedbacks=feedbacks,
                 request_settings=self.request_settings,
                 json_schema=ImprovedResponse,
             )
 
-            child_node.answer = improved_version
+            new_children: List[Node] = []
+            for improved_version in improved_versions:
+                # create and add child node
+                child_node: Node = Node(
+                    original_prompt=self.original_prompt,
+                    answer=improved_version,
+                    parent=node,
+                    max_children=self.max_children,
+                    level=node.level + 1,
+                    exploration_weight=self.exploration_weight,
+                )
+                node.add_child(child_node)
+                new_children.append(child_node)
 
-        selected_node: Node = random.choice(node.children)
-        return selected_node
+            return new_children
 
     def backpropagate(self, node: Optional[Node], reward: float) -> None:
         """
@@ -250,7 +597,7 @@ class MCTS:
 
             node = node.parent
 
-    def simulate(self, node: Node) -> float:
+    async def simulate(self, node: Node) -> float:
         """
         Simulates the process of generating a rating for the current node's answer.
 
@@ -260,13 +607,40 @@ class MCTS:
         Returns:
             float: The rating score for the node's answer.
         """
-        rating: float = generate_rating(
-            prompt=self.original_prompt,
-            answer=node.answer,
-            request_settings=self.request_settings,
-            json_schema=RatingResponse,
-        )
-        return rating
+        ratings: List[float] = await self.simulate_batch([node])
+        return ratings[0]
+
+    async def simulate_batch(self, nodes: List[Node]) -> List[float]:
+        """
+        Rates the answers of several nodes in one batch.
+
+        Ratings are memoized by answer, so answers that were rated before (e.g. a refinement
+        that returned the previous answer unchanged) and duplicates within the batch are only
+        sent to the model once.
+
+        Args:
+            nodes (List[Node]): The nodes whose answers are being rated.
+
+        Returns:
+            List[float]: The rating score for each node's answer, in the order of `nodes`.
+        """
+        keys: List[bytes] = [hashlib.sha1(node.answer.encode()).digest() for node in nodes]
+
+        pending: Dict[bytes, str] = {}
+        for key, node in zip(keys, nodes):
+            if key not in self._rating_cache:
+                pending[key] = node.answer
+
+        if pending:
+            ratings: List[float] = await agenerate_rating_batch(
+                prompt=self.original_prompt,
+                answers=list(pending.values()),
+                request_settings=self.request_settings,
+                json_schema=RatingResponse,
+            )
+            self._rating_cache.update(zip(pending.keys(), ratings))
+
+        return [self._rating_cache[key] for key in keys]
 
     def get_best_path(self) -> List[Node]:
         """
@@ -10,52 +10,68 @@ class ImprovedResponse(BaseModel):
     ImprovedText: str
 
 
-critique_prompt = """
+# Every template starts with its static instructions followed by the original prompt, which is
+# the same for all requests of a search. Only the trailing part varies between requests, so
+# providers with prefix caching (OpenAI, Anthropic, vLLM) can reuse the KV cache of the prefix.
+
+critique_prompt_prefix = """
 You are an expert assistant analyzing the user's original prompt and the provided initial answer.
 Your goal is to give clear, constructive, and concise feedback that will guide improvement.
 
-Original Prompt:
-{original_prompt}
-
-Initial Answer:
-{initial_answer}
-
 Instructions:
 - Provide a high-quality critique that focuses on how this answer could be improved.
 - Be concise and to the point.
 - Highlight key areas that need correction, clarification, or further detail.
 - Do not rewrite or provide the full answer; focus only on providing feedback.
+
+Original Prompt:
+{original_prompt}
 """
 
-refine_prompt = """
+critique_prompt_suffix = """
+Initial Answer:
+{initial_answer}
+"""
+
+critique_prompt = critique_prompt_prefix + critique_prompt_suffix
+
+refine_prompt_prefix = """
 You are an expert assistant refining the previous answer based on new feedback.
 
+Instructions:
+- Incorporate the provided feedback to enhance correctness, clarity, and completeness.
+- Maintain relevance to the original prompt.
+- Produce a revised answer that is improved in quality.
+
 Original Prompt:
 {original_prompt}
+"""
 
+refine_prompt_suffix = """
 Previous Answer:
 {previous_answer}
 
 Feedback (Critique):
 {feedback}
-
-Instructions:
-- Incorporate the provided feedback to enhance correctness, clarity, and completeness.
-- Maintain relevance to the original prompt.
-- Produce a revised answer that is improved in quality.
 """
 
-rating_prompt = """
+refine_prompt = refine_prompt_prefix + refine_prompt_suffix
+
+rating_prompt_prefix = """
 You are an expert assistant evaluating the quality of the improved answer.
 
+Instructions:
+- Assign a rating from 0 to 100, where 0 is completely inadequate and 100 is a perfect response.
+- Provide a concise justification (1–3 sentences) explaining your rating.
+- Clearly output your final numeric rating on its own line at the end.
+
 Original Prompt:
 {original_prompt}
+"""
 
+rating_prompt_suffix = """
 Improved Answer:
 {improved_answer}
-
-Instructions:
-- Assign a rating from 0 to 100, where 0 is completely inadequate and 100 is a perfect response.
-- Provide a concise justification (1–3 sentences) explaining your rating.
-- Clearly output your final numeric rating on its own line at the end.
 """
+
+rating_prompt = rating_prompt_prefix + rating_prompt_suffix
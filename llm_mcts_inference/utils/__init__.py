@@ -1,3 +1,20 @@
-from .utils import extract_first_number, normalize_rating_score
+from .batching import BatchingClient
+from .cache import LLMCache, make_cache_key
+from .uct import uct_argmax
+from .utils import (
+    extract_first_number,
+    is_numeric_score,
+    normalize_rating_score,
+    normalize_rating_scores,
+)
 
-__all__ = ["normalize_rating_score", "extract_first_number"]
+__all__ = [
+    "normalize_rating_score",
+    "normalize_rating_scores",
+    "extract_first_number",
+    "is_numeric_score",
+    "BatchingClient",
+    "LLMCache",
+    "make_cache_key",
+    "uct_argmax",
+]
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import litellm
+
+from .cache import dumps_sorted
+
+# a queued request: messages, request settings, and the future that receives the response
+_PendingRequest = Tuple[List[Any], Dict[str, Any], "asyncio.Future[str]"]
+
+
+class BatchingClient:
+    """
+    Collects concurrent text requests and sends them to the model in batches.
+
+    A batch is flushed once it holds `max_batch_size` requests or `max_wait_ms` milliseconds
+    after its first request arrived, whichever comes first. Requests of a batch are grouped by
+    their settings, and each group is sent with one `litellm.batch_completion` call.
+
+    The client belongs to the event loop it is first used in.
+
+    Attributes:
+        max_batch_size (int): The maximum number of requests per batch.
+        max_wait_ms (float): How long a batch waits for more requests, in milliseconds.
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 20.0) -> None:
+        self.max_batch_size: int = max_batch_size
+        self.max_wait_ms: float = max_wait_ms
+
+        self._queue: asyncio.Queue[_PendingRequest] = asyncio.Queue()
+        self._collector: Optional["asyncio.Task[None]"] = None
+        # strong references, so pending flushes are not garbage collected
+        self._flushes: Set["asyncio.Task[None]"] = set()
+
+    async def complete(self, messages: List[Any], request_settings: Dict[str, Any]) -> str:
+        """
+        Queues a request for the next batch and waits for its response.
+
+        Args:
+            messages (List[Any]): The chat messages of the request.
+            request_settings (Dict[str, Any]): Configuration dictionary.
+
+        Returns:
+            str: The model's response as a string extracted from the first choice.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[str] = loop.create_future()
+        self._queue.put_nowait((messages, request_settings, future))
+
+        if self._collector is None or self._collector.done():
+            self._collector = loop.create_task(self._collect())
+
+        return await future
+
+    async def _collect(self) -> None:
+        """
+        Forms batches from the queued requests until the queue is empty.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            batch: List[_PendingRequest] = [self._queue.get_nowait()]
+            deadline: float = loop.time() + self.max_wait_ms / 1_000
+
+            while len(batch) < self.max_batch_size:
+                timeout: float = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[bytes, List[_PendingRequest]] = {}
+            for request in batch:
+                key: bytes = dumps_sorted(request[1])
+                groups.setdefault(key, []).append(request)
+
+            # flushes run in the background, so the next batch is collected meanwhile
+            for group in groups.values():
+                flush = loop.create_task(self._flush(group))
+                self._flushes.add(flush)
+                flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, group: List[_PendingRequest]) -> None:
+        """
+        Sends a group of requests with identical settings and resolves their futures.
+
+        Args:
+            group (List[_PendingRequest]): The requests to send.
+        """
+        request_settings: Dict[str, Any] = group[0][1]
+        try:
+            responses: List[Any] = await asyncio.to_thread(
+                litellm.batch_completion,
+                messages=[messages for messages, _, _ in group],
+                **request_settings,
+            )
+        except Exception as e:
+            for _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), response in zip(group, responses):
+            if future.done():  # the caller was cancelled
+                continue
+            # failed requests are returned in place of their response
+            if isinstance(response, Exception):
+                future.set_exception(response)
+            else:
+                future.set_result(str(response["choices"][0]["message"]["content"]))
@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    import orjson
+
+    _HAS_ORJSON = True
+except ImportError:  # orjson is an optional dependency
+    _HAS_ORJSON = False
+
+
+class LLMCache:
+    """
+    A bounded in-memory cache for model responses with least-recently-used eviction.
+
+    Attributes:
+        maxsize (int): The maximum number of cached responses.
+    """
+
+    def __init__(self, maxsize: int = 4_096) -> None:
+        self.maxsize: int = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def lookup(self, key: Optional[Hashable]) -> Optional[Any]:
+        """
+        Looks up a cached response.
+
+        Args:
+            key (Optional[Hashable]): The cache key. `None` marks an uncacheable request.
+
+        Returns:
+            Optional[Any]: The cached response, or None if there is no entry for the key.
+        """
+        if key is None or key not in self._entries:
+            return None
+
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def update(self, key: Optional[Hashable], value: Any) -> None:
+        """
+        Stores a response, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Optional[Hashable]): The cache key. `None` marks an uncacheable request.
+            value (Any): The response to store.
+        """
+        if key is None:
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all cached responses."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def make_cache_key(
+    prompt: str, request_settings: Dict[str, Any], json_schema: Any = None
+) -> Optional[str]:
+    """
+    Builds the cache key for a model request.
+
+    Only greedy requests (temperature of 0) are cacheable, since sampled responses are
+    expected to differ between calls. The key is the digest of the canonical JSON form of the
+    messages, the request settings, and the schema. The hash function is chosen with the
+    LLM_CACHE_HASH environment variable: "sha256" (default), "blake3", or "xxh3".
+
+    Args:
+        prompt (str): The prompt sent to the model.
+        request_settings (Dict[str, Any]): The settings of the request.
+        json_schema (Any, optional): The schema of a structured request. Defaults to None.
+
+    Returns:
+        Optional[str]: The cache key, or None if the request must not be cached.
+    """
+    if request_settings.get("temperature") != 0:
+        return None
+
+    schema: Optional[str] = (
+        None if json_schema is None else f"{json_schema.__module__}.{json_schema.__qualname__}"
+    )
+    request = {
+        "messages": [{"content": prompt, "role": "user"}],
+        "settings": request_settings,
+        "response_model": schema,
+    }
+    hash_function = _hash_function(os.getenv("LLM_CACHE_HASH", "sha256").lower())
+    return hash_function(dumps_sorted(request))
+
+
+def dumps_sorted(obj: Any) -> bytes:
+    """
+    Serializes an object to JSON with sorted keys, using orjson if it is installed.
+
+    Sorting makes the output independent of the insertion order of dictionaries. Values that
+    are not JSON serializable are replaced by their repr.
+
+    Args:
+        obj (Any): The object to serialize.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    if _HAS_ORJSON:
+        return orjson.dumps(
+            obj, default=repr, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+
+    return json.dumps(obj, sort_keys=True, default=repr).encode()
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_function(name: str) -> Callable[[bytes], str]:
+    """
+    Returns the function that hashes serialized requests into cache keys.
+
+    blake3 and xxh3 need the `blake3` and `xxhash` packages; without them, SHA-256 is used.
+
+    Args:
+        name (str): The name of the hash function: "sha256", "blake3", or "xxh3".
+
+    Returns:
+        Callable[[bytes], str]: A function returning the hex digest of its input.
+
+    Raises:
+        ValueError: If the name is not a supported hash function.
+    """
+    if name == "blake3":
+        try:
+            from blake3 import blake3
+
+            return lambda data: str(blake3(data).hexdigest())
+        except ImportError:  # blake3 is an optional dependency
+            pass
+    elif name == "xxh3":
+        try:
+            import xxhash
+
+            return lambda data: str(xxhash.xxh3_128_hexdigest(data))
+        except ImportError:  # xxhash is an optional dependency
+            pass
+    elif name != "sha256":
+        raise ValueError(f"Unsupported cache hash function: {name}")
+
+    return lambda data: hashlib.sha256(data).hexdigest()
@@ -0,0 +1,68 @@
+import math
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+
+
+def _uct_argmax_loop(visits: FloatArray, values: FloatArray, exploration_factor: float) -> int:
+    """
+    Returns the index of the child with the highest UCT weight using a single loop.
+
+    This is the kernel compiled with Numba; interpreted, it is only a reference implementation.
+
+    Args:
+        visits (FloatArray): The visit counts of the children.
+        values (FloatArray): The accumulated values of the children.
+        exploration_factor (float): The exploration weight times the square root of the
+            natural logarithm of the visit count of the parent.
+
+    Returns:
+        int: The index of the best child. Ties go to the first child.
+    """
+    best_index = 0
+    best_weight = -math.inf
+    for i in range(visits.shape[0]):
+        if visits[i] == 0:
+            return i  # explore unvisited nodes first
+
+        weight = values[i] / visits[i] + exploration_factor / math.sqrt(visits[i])
+        if weight > best_weight:
+            best_index = i
+            best_weight = weight
+
+    return best_index
+
+
+def _uct_argmax_numpy(visits: FloatArray, values: FloatArray, exploration_factor: float) -> int:
+    """
+    Returns the index of the child with the highest UCT weight using vectorized NumPy.
+
+    Args:
+        visits (FloatArray): The visit counts of the children.
+        values (FloatArray): The accumulated values of the children.
+        exploration_factor (float): The exploration weight times the square root of the
+            natural logarithm of the visit count of the parent.
+
+    Returns:
+        int: The index of the best child. Ties go to the first child.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(
+            visits == 0,
+            np.inf,  # explore unvisited nodes first
+            values / visits + exploration_factor / np.sqrt(visits),
+        )
+    return int(np.argmax(weights))
+
+
+uct_argmax: Callable[[FloatArray, FloatArray, float], int]
+try:
+    from numba import njit
+
+    # compiled lazily on first use; the machine code is cached on disk across runs
+    uct_argmax = njit(cache=True)(_uct_argmax_loop)
+except ImportError:  # numba is an optional dependency
+    uct_argmax = _uct_argmax_numpy
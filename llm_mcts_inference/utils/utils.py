@@ -1,6 +1,13 @@
 import re
 from typing import Union
 
+import numpy as np
+import numpy.typing as npt
+
+# optional leading minus, digits with at most one decimal point (e.g. "12", "-1.5", ".5", "3.")
+_NUMERIC_SCORE_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)")
+_FIRST_INT_RE = re.compile(r"\d+")
+
 
 def normalize_rating_score(score: Union[int, str]) -> float:
     """
@@ -27,12 +34,26 @@ def normalize_rating_score(score: Union[int, str]) -> float:
     return capped_score / 100.0
 
 
+def normalize_rating_scores(scores: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """
+    Normalize a batch of rating scores to float values between 0 and 0.95 in one pass.
+
+    Args:
+        scores (npt.ArrayLike): The rating scores to normalize. Can be a list or array of
+            numbers or numeric strings.
+
+    Returns:
+        npt.NDArray[np.float64]: The normalized scores, capped between 0 and 0.95.
+    """
+    return np.clip(np.asarray(scores, dtype=np.float64) / 100.0, 0.0, 0.95)
+
+
 def is_numeric_score(s: str) -> bool:
     """
     Check if a string represents a numeric value, including integers or decimals.
 
     The function allows:
-    - Positive and negative numbers.
+    - Positive and negative numbers (with a leading minus sign).
     - A single decimal point.
 
     Args:
@@ -42,8 +63,7 @@ def is_numeric_score(s: str) -> bool:
         bool: True if the string represents a valid number (integer or decimal),
               False otherwise.
     """
-    s = s.replace("-", "", 1)
-    return s.replace(".", "", 1).isdigit()
+    return _NUMERIC_SCORE_RE.fullmatch(s) is not None
 
 
 def extract_first_number(s: str) -> int:
@@ -54,9 +74,10 @@ def extract_first_number(s: str) -> int:
         s (str): The input string.
 
     Returns:
-        int: The first number found in the string. Returns None if no number is found.
+        int: The first number found in the string. Returns 0 if no number is found.
     """
-    match = re.search(r"\d+", s)
-    if match:
-        return int(match.group())
-    return 0
+    if not s:
+        return 0
+
+    match = _FIRST_INT_RE.search(s)
+    return int(match.group()) if match else 0
@@ -0,0 +1,106 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from pydantic import BaseModel
+
+from llm_mcts_inference.utils.cache import LLMCache, dumps_sorted, make_cache_key
+
+
+class MockResponse(BaseModel):
+    text: str
+
+
+def test_lookup_and_update():
+    """
+    Test that stored responses can be looked up again.
+    """
+    cache = LLMCache()
+    assert cache.lookup("key") is None
+
+    cache.update("key", "value")
+    assert cache.lookup("key") == "value"
+    assert len(cache) == 1
+
+
+def test_none_key_is_not_cached():
+    """
+    Test that uncacheable requests (key None) are neither stored nor found.
+    """
+    cache = LLMCache()
+    cache.update(None, "value")
+    assert cache.lookup(None) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """
+    Test that the least recently used entry is evicted once the cache is full.
+    """
+    cache = LLMCache(maxsize=2)
+    cache.update("a", 1)
+    cache.update("b", 2)
+    cache.lookup("a")  # "b" is now the least recently used entry
+    cache.update("c", 3)
+
+    assert cache.lookup("a") == 1
+    assert cache.lookup("b") is None
+    assert cache.lookup("c") == 3
+
+
+def test_make_cache_key_only_for_greedy_requests():
+    """
+    Test that only requests with a temperature of 0 get a cache key.
+    """
+    assert make_cache_key("prompt", {"model": "m", "temperature": 0.0}) is not None
+    assert make_cache_key("prompt", {"model": "m", "temperature": 0.7}) is None
+    assert make_cache_key("prompt", {"model": "m"}) is None
+
+
+def test_make_cache_key_distinguishes_requests():
+    """
+    Test that the key depends on the prompt, the settings, and the schema.
+    """
+    settings = {"model": "m", "temperature": 0.0}
+    key = make_cache_key("prompt", settings)
+
+    assert key == make_cache_key("prompt", {"temperature": 0.0, "model": "m"})
+    assert key != make_cache_key("other prompt", settings)
+    assert key != make_cache_key("prompt", {**settings, "max_tokens": 10})
+    assert key != make_cache_key("prompt", settings, MockResponse)
+
+
+def test_dumps_sorted_json_fallback():
+    """
+    Test that the stdlib fallback also serializes with sorted keys.
+    """
+    obj = {"b": [1, 2], "a": {"d": None, "c": "x"}}
+    with patch("llm_mcts_inference.utils.cache._HAS_ORJSON", False):
+        fallback = dumps_sorted(obj)
+
+    assert json.loads(fallback) == obj
+    assert fallback.index(b'"a"') < fallback.index(b'"b"')
+    assert dumps_sorted({"a": 1, "b": 2}) == dumps_sorted({"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize("name", ["sha256", "blake3", "xxh3"])
+def test_make_cache_key_hash_function(monkeypatch, name):
+    """
+    Test that every selectable hash function yields stable keys.
+    """
+    monkeypatch.setenv("LLM_CACHE_HASH", name)
+    settings = {"model": "m", "temperature": 0.0}
+
+    key = make_cache_key("prompt", settings)
+    assert isinstance(key, str)
+    assert key == make_cache_key("prompt", dict(settings))
+    assert key != make_cache_key("other prompt", settings)
+
+
+def test_make_cache_key_rejects_unknown_hash_function(monkeypatch):
+    """
+    Test that an unknown hash function name is reported.
+    """
+    monkeypatch.setenv("LLM_CACHE_HASH", "crc32")
+    with pytest.raises(ValueError):
+        make_cache_key("prompt", {"model": "m", "temperature": 0.0})
@@ -1,15 +1,34 @@
-from unittest.mock import patch
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
+import pytest
+from litellm.exceptions import RateLimitError
 from pydantic import BaseModel
 
+from llm_mcts_inference.config import PHASE_MAX_TOKENS
+from llm_mcts_inference.prompts import critique_prompt
 from llm_mcts_inference.inference import (
+    agenerate_feedback_batch,
+    agenerate_improved_version,
+    agenerate_rating,
+    agenerate_rating_batch,
+    aget_model_response,
+    aget_model_response_batch,
+    aget_structured_model_response,
     generate_feedback,
     generate_improved_version,
     generate_initial_answer,
     generate_rating,
     get_model_response,
+    get_model_response_batch,
     get_structured_model_response,
+    _async_client,
+    _client,
+    _response_cache,
+    _response_model_of,
 )
+from llm_mcts_inference.utils import make_cache_key
 
 
 class MockRatingResponse(BaseModel):
@@ -20,6 +39,12 @@ class MockImprovedResponse(BaseModel):
     ImprovedText: str
 
 
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Fixture to start every test with an empty response cache."""
+    _response_cache.clear()
+
+
 def test_generate_initial_answer():
     """
     Test generate_initial_answer with mocked response.
@@ -31,13 +56,13 @@ def test_generate_initial_answer():
 
     mock_response = {"choices": [{"message": {"content": "The capital of France is Paris."}}]}
 
-    with patch("litellm.completion", return_value=mock_response) as mock_completion:
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
         response = generate_initial_answer(prompt, request_settings)
 
         assert response == "The capital of France is Paris.", "Response content mismatch."
 
         mock_completion.assert_called_once_with(
-            messages=[{"content": prompt, "role": "user"}], **expected_settings
+            messages=[[{"content": prompt, "role": "user"}]], **expected_settings
         )
 
 
@@ -60,6 +85,43 @@ def test_generate_rating():
         assert response == 0.85, "Normalized rating score mismatch."
 
 
+def test_generate_rating_raw_json_fallback():
+    """
+    Test generate_rating parses the rating from a raw JSON fallback response.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    raw_response = '{"justification": "Covers 3 of 4 points.", "rating": 70}'
+
+    with patch(
+        "llm_mcts_inference.inference.get_structured_model_response",
+        return_value=raw_response,
+    ):
+        response = generate_rating(
+            "Rate the answer.", "Paris", request_settings, MockRatingResponse
+        )
+
+        assert response == 0.7, "Rating should come from the JSON field, not the first number."
+
+
+@pytest.mark.parametrize("rating", ["NaN", "Infinity", "-Infinity"])
+def test_generate_rating_raw_json_fallback_non_finite(rating):
+    """
+    Test generate_rating falls back to the first number if the JSON rating is not finite.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    raw_response = f'{{"justification": "Scored 40 points.", "rating": {rating}}}'
+
+    with patch(
+        "llm_mcts_inference.inference.get_structured_model_response",
+        return_value=raw_response,
+    ):
+        response = generate_rating(
+            "Rate the answer.", "Paris", request_settings, MockRatingResponse
+        )
+
+    assert response == 0.4, "A non-finite JSON rating should fall through to the first number."
+
+
 def test_generate_feedback():
     """
     Test generate_feedback with mocked response.
@@ -69,28 +131,30 @@ def test_generate_feedback():
     request_settings = {"model_name": "gpt-3.5-turbo"}
 
     expected_message = (
-        "\nYou are an expert assistant analyzing the user's original prompt and the provided initial answer.\n"
-        "Your goal is to give clear, constructive, and concise feedback that will guide improvement.\n\n"
-        "Original Prompt:\nWhat is the capital of France?\n\n"
-        "Initial Answer:\nParis\n\n"
+        "\nYou are an expert assistant analyzing the user's original prompt and the provided "
+        "initial answer.\n"
+        "Your goal is to give clear, constructive, and concise feedback that will guide "
+        "improvement.\n\n"
         "Instructions:\n"
         "- Provide a high-quality critique that focuses on how this answer could be improved.\n"
         "- Be concise and to the point.\n"
         "- Highlight key areas that need correction, clarification, or further detail.\n"
-        "- Do not rewrite or provide the full answer; focus only on providing feedback.\n"
+        "- Do not rewrite or provide the full answer; focus only on providing feedback.\n\n"
+        "Original Prompt:\nWhat is the capital of France?\n\n"
+        "Initial Answer:\nParis\n"
     )
 
     mock_response = {
         "choices": [{"message": {"content": "The answer is correct, but add more details."}}]
     }
 
-    with patch("litellm.completion", return_value=mock_response) as mock_completion:
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
         response = generate_feedback(prompt, answer, request_settings)
 
         assert response == "The answer is correct, but add more details.", "Feedback mismatch."
 
         mock_completion.assert_called_once_with(
-            messages=[{"content": expected_message, "role": "user"}], **request_settings
+            messages=[[{"content": expected_message, "role": "user"}]], **request_settings
         )
 
 
@@ -129,15 +193,52 @@ def test_get_model_response():
 
     mock_response = {"choices": [{"message": {"content": "The capital of France is Paris."}}]}
 
-    with patch("litellm.completion", return_value=mock_response) as mock_completion:
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
         response = get_model_response(prompt, request_settings)
 
         assert response == "The capital of France is Paris.", "Response content mismatch."
         mock_completion.assert_called_once_with(
-            messages=[{"content": prompt, "role": "user"}], **request_settings
+            messages=[[{"content": prompt, "role": "user"}]], **request_settings
         )
 
 
+def test_get_model_response_batch():
+    """
+    Test get_model_response_batch sends all uncached prompts in one batch, in order.
+    """
+    prompts = ["First?", "Second?", "Third?"]
+    request_settings = {"model_name": "gpt-3.5-turbo", "temperature": 0}
+
+    _response_cache.update(make_cache_key("Second?", request_settings), "cached")
+    mock_responses = [
+        {"choices": [{"message": {"content": "first"}}]},
+        {"choices": [{"message": {"content": "third"}}]},
+    ]
+
+    with patch("litellm.batch_completion", return_value=mock_responses) as mock_completion:
+        responses = get_model_response_batch(prompts, request_settings)
+
+    assert responses == ["first", "cached", "third"], "Responses should keep the prompt order."
+    mock_completion.assert_called_once_with(
+        messages=[
+            [{"content": "First?", "role": "user"}],
+            [{"content": "Third?", "role": "user"}],
+        ],
+        **request_settings,
+    )
+
+
+def test_get_model_response_batch_raises_failed_request():
+    """
+    Test get_model_response_batch raises the exception returned for a failed request.
+    """
+    error = ValueError("request failed")
+
+    with patch("litellm.batch_completion", return_value=[error]):
+        with pytest.raises(ValueError, match="request failed"):
+            get_model_response_batch(["Prompt"], {"model_name": "gpt-3.5-turbo"})
+
+
 def test_get_structured_model_response():
     """
     Test get_structured_model_response with mocked structured response.
@@ -150,8 +251,8 @@ def test_get_structured_model_response():
         ImprovedText="The capital of France is Paris, located in Europe."
     )
 
-    with patch("instructor.from_litellm") as mock_instructor:
-        mock_client = mock_instructor.return_value
+    with patch("llm_mcts_inference.inference._client") as mock_get_client:
+        mock_client = mock_get_client.return_value
         mock_client.create.return_value = mock_structured_response
 
         response = get_structured_model_response(prompt, request_settings, mock_schema)
@@ -159,7 +260,337 @@ def test_get_structured_model_response():
         assert response == mock_structured_response, "Structured response mismatch."
 
         mock_client.create.assert_called_once_with(
-            response_model=mock_schema,
+            response_model=_response_model_of(mock_schema),
             messages=[{"content": prompt, "role": "user"}],
             **request_settings,
         )
+
+
+def test_get_model_response_caches_greedy_requests():
+    """
+    Test an identical greedy request is answered from the cache without calling the model.
+    """
+    request_settings = {"model": "gpt-3.5-turbo", "temperature": 0.0}
+    mock_response = {"choices": [{"message": {"content": "Paris"}}]}
+
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
+        first = get_model_response("Capital of France?", request_settings)
+        second = get_model_response("Capital of France?", request_settings)
+
+    assert first == second == "Paris"
+    assert mock_completion.call_count == 1, "The repeated request should hit the cache."
+
+
+def test_get_model_response_does_not_cache_sampled_requests():
+    """
+    Test requests with a temperature above 0 are always sent to the model.
+    """
+    request_settings = {"model": "gpt-3.5-turbo", "temperature": 0.7}
+    mock_response = {"choices": [{"message": {"content": "Paris"}}]}
+
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
+        get_model_response("Capital of France?", request_settings)
+        get_model_response("Capital of France?", request_settings)
+
+    assert mock_completion.call_count == 2, "Sampled requests must not be cached."
+
+
+def test_get_structured_model_response_caches_greedy_requests():
+    """
+    Test an identical greedy structured request is answered from the cache.
+    """
+    request_settings = {"model": "gpt-3.5-turbo", "temperature": 0.0}
+
+    with patch("llm_mcts_inference.inference._client") as mock_get_client:
+        mock_client = mock_get_client.return_value
+        mock_client.create.return_value = MockRatingResponse(rating=90)
+        first = get_structured_model_response("Rate it.", request_settings, MockRatingResponse)
+        second = get_structured_model_response("Rate it.", request_settings, MockRatingResponse)
+
+    assert first == second == MockRatingResponse(rating=90)
+    assert mock_client.create.call_count == 1, "The repeated request should hit the cache."
+
+
+def test_instructor_clients_are_shared():
+    """
+    Test the instructor clients are built once and reused by later requests.
+    """
+    assert _client() is _client()
+    assert _async_client() is _async_client()
+
+
+def test_response_model_of_wraps_schema_once():
+    """
+    Test the instructor response model is built once per schema and keeps the schema's fields.
+    """
+    response_model = _response_model_of(MockRatingResponse)
+
+    assert response_model is _response_model_of(MockRatingResponse)
+    assert issubclass(response_model, MockRatingResponse)
+    assert _response_model_of(None) is None
+
+
+@pytest.mark.asyncio
+async def test_aget_model_response():
+    """
+    Test aget_model_response with mocked batched response.
+    """
+    prompt = "What is the capital of France?"
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+
+    mock_response = {"choices": [{"message": {"content": "The capital of France is Paris."}}]}
+
+    with patch("litellm.batch_completion", return_value=[mock_response]) as mock_completion:
+        response = await aget_model_response(prompt, request_settings)
+
+        assert response == "The capital of France is Paris.", "Response content mismatch."
+        mock_completion.assert_called_once_with(
+            messages=[[{"content": prompt, "role": "user"}]], **request_settings
+        )
+
+
+@pytest.mark.asyncio
+async def test_aget_model_response_batches_concurrent_requests():
+    """
+    Test concurrent aget_model_response calls are sent in one batch, each getting its response.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    prompts = [f"Prompt {i}" for i in range(8)]
+
+    def mock_batch_completion(messages, **kwargs):
+        return [{"choices": [{"message": {"content": m[0]["content"].upper()}}]} for m in messages]
+
+    with patch("litellm.batch_completion", side_effect=mock_batch_completion) as mock_completion:
+        responses = await asyncio.gather(
+            *(aget_model_response(p, request_settings) for p in prompts)
+        )
+
+    assert responses == [p.upper() for p in prompts], "Responses were not routed to their caller."
+    mock_completion.assert_called_once()
+    assert len(mock_completion.call_args.kwargs["messages"]) == 8
+
+
+@pytest.mark.asyncio
+async def test_aget_model_response_batches_by_settings():
+    """
+    Test concurrent requests with different settings are sent in separate batches.
+    """
+    mock_response = {"choices": [{"message": {"content": "Answer"}}]}
+
+    def mock_batch_completion(messages, **kwargs):
+        return [mock_response] * len(messages)
+
+    with patch("litellm.batch_completion", side_effect=mock_batch_completion) as mock_completion:
+        await asyncio.gather(
+            aget_model_response("Prompt", {"model_name": "gpt-3.5-turbo"}),
+            aget_model_response("Prompt", {"model_name": "gpt-3.5-turbo", "max_tokens": 10}),
+        )
+
+    assert mock_completion.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_aget_model_response_limits_requests_in_flight(monkeypatch):
+    """
+    Test aget_model_response_batch keeps at most LLM_INFLIGHT_LIMIT requests in flight.
+    """
+    monkeypatch.setenv("LLM_INFLIGHT_LIMIT", "2")
+    batch_sizes = []
+
+    def mock_batch_completion(messages, **kwargs):
+        batch_sizes.append(len(messages))
+        return [{"choices": [{"message": {"content": "Answer"}}]}] * len(messages)
+
+    with patch("litellm.batch_completion", side_effect=mock_batch_completion):
+        responses = await aget_model_response_batch(
+            [f"Prompt {i}" for i in range(6)], {"model_name": "gpt-3.5-turbo"}
+        )
+
+    assert responses == ["Answer"] * 6
+    assert max(batch_sizes) == 2, "The in-flight limit was not respected."
+
+
+@pytest.mark.asyncio
+async def test_aget_model_response_retries_rate_limit():
+    """
+    Test aget_model_response retries rate-limited requests with exponential backoff.
+    """
+    rate_limit = RateLimitError("slow down", llm_provider="openai", model="gpt-3.5-turbo")
+    mock_response = {"choices": [{"message": {"content": "Answer"}}]}
+
+    with (
+        patch(
+            "litellm.batch_completion",
+            side_effect=[[rate_limit], [rate_limit], [mock_response]],
+        ) as mock_completion,
+        patch("llm_mcts_inference.inference.asyncio.sleep", new_callable=AsyncMock) as mock_sleep,
+    ):
+        response = await aget_model_response("Prompt", {"model_name": "gpt-3.5-turbo"})
+
+    assert response == "Answer"
+    assert mock_completion.call_count == 3
+    assert [c.args[0] for c in mock_sleep.await_args_list] == [1.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_agenerate_rating():
+    """
+    Test agenerate_rating with mocked asynchronous structured response.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+
+    with patch(
+        "llm_mcts_inference.inference.aget_structured_model_response",
+        new_callable=AsyncMock,
+        return_value=MockRatingResponse(rating=85),
+    ):
+        response = await agenerate_rating(
+            "Rate the answer.", "Paris", request_settings, MockRatingResponse
+        )
+
+        assert response == 0.85, "Normalized rating score mismatch."
+
+
+@pytest.mark.asyncio
+async def test_agenerate_feedback_batch():
+    """
+    Test agenerate_feedback_batch keeps one feedback per answer in order.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+
+    async def mock_response(prompt, request_settings):
+        return "Feedback for Paris" if "Paris" in prompt else "Feedback for Lyon"
+
+    with patch("llm_mcts_inference.inference.aget_model_response", side_effect=mock_response):
+        response = await agenerate_feedback_batch(
+            "Capital of France?", ["Paris", "Lyon"], request_settings
+        )
+
+    assert response == ["Feedback for Paris", "Feedback for Lyon"], "Feedback order mismatch."
+
+
+@pytest.mark.asyncio
+async def test_agenerate_feedback_batch_prompts_match_template():
+    """
+    Test the batched critique prompts equal the full template, even with braces in the input.
+    """
+    prompt = "Simplify {x} / 2"
+    answers = ["\\frac{x}{2}", "x/2"]
+
+    with patch(
+        "llm_mcts_inference.inference.aget_model_response_batch",
+        new_callable=AsyncMock,
+        return_value=["Feedback", "Feedback"],
+    ) as mock_batch:
+        await agenerate_feedback_batch(prompt, answers, {"model_name": "gpt-3.5-turbo"})
+
+    expected = [
+        critique_prompt.format_map({"original_prompt": prompt, "initial_answer": a})
+        for a in answers
+    ]
+    assert mock_batch.await_args.args[0] == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_tokens", [8_192, None])
+async def test_agenerate_rating_batch_caps_max_tokens(max_tokens):
+    """
+    Test agenerate_rating_batch limits the generation length of rating requests.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo", "max_tokens": max_tokens}
+
+    with patch(
+        "llm_mcts_inference.inference.aget_structured_model_response",
+        new_callable=AsyncMock,
+        return_value=MockRatingResponse(rating=85),
+    ) as mock_structured:
+        response = await agenerate_rating_batch(
+            "Rate the answer.", ["Paris"], request_settings, None
+        )
+
+    assert response == [0.85], "Normalized rating score mismatch."
+    sent_settings = mock_structured.await_args.args[1]
+    assert sent_settings["max_tokens"] == PHASE_MAX_TOKENS["rating"]
+    assert request_settings["max_tokens"] == max_tokens, "Caller settings must not be mutated."
+
+
+class MockStream:
+    """Async iterator over text chunks that mimics a streamed litellm response."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.aclose = AsyncMock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed == len(self.chunks):
+            raise StopAsyncIteration
+        content = self.chunks[self.consumed]
+        self.consumed += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+@pytest.mark.asyncio
+async def test_aget_structured_model_response_streams_raw_fallback():
+    """
+    Test the raw fallback stops streaming once the response forms a complete JSON object.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    stream = MockStream(['{"justification": "Uses { and }', '.", "rating": 80} and', " more text"])
+
+    with (
+        patch("llm_mcts_inference.inference._async_client") as mock_get_client,
+        patch("litellm.acompletion", new_callable=AsyncMock, return_value=stream),
+    ):
+        mock_get_client.return_value.create = AsyncMock(side_effect=ValueError("validation failed"))
+        response = await aget_structured_model_response(
+            "Rate it.", request_settings, MockRatingResponse, stop_at_json_end=True
+        )
+
+    assert response == '{"justification": "Uses { and }.", "rating": 80}'
+    assert stream.consumed == 2, "Streaming should stop after the JSON object is complete."
+    stream.aclose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_aget_structured_model_response_streams_plain_text_fallback():
+    """
+    Test the raw fallback returns the full response if it is not a JSON object.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    stream = MockStream(["The answer is ", "{1}/{2}."])
+
+    with (
+        patch("llm_mcts_inference.inference._async_client") as mock_get_client,
+        patch("litellm.acompletion", new_callable=AsyncMock, return_value=stream),
+    ):
+        mock_get_client.return_value.create = AsyncMock(side_effect=ValueError("validation failed"))
+        response = await aget_structured_model_response(
+            "Improve it.", request_settings, MockImprovedResponse
+        )
+
+    assert response == "The answer is {1}/{2}."
+
+
+@pytest.mark.asyncio
+async def test_aget_structured_model_response_streams_refine_fallback_to_completion():
+    """
+    Test the raw fallback of an improved answer keeps the text after a leading JSON object.
+    """
+    request_settings = {"model_name": "gpt-3.5-turbo"}
+    stream = MockStream(['{"port": 8080}', "\n\nThis config sets the port."])
+
+    with (
+        patch("llm_mcts_inference.inference._async_client") as mock_get_client,
+        patch("litellm.acompletion", new_callable=AsyncMock, return_value=stream),
+    ):
+        mock_get_client.return_value.create = AsyncMock(side_effect=ValueError("validation failed"))
+        response = await agenerate_improved_version(
+            "Write a config.", "port: 80", "Use port 8080.", request_settings, MockImprovedResponse
+        )
+
+    assert response == '{"port": 8080}\n\nThis config sets the port.'
+    assert stream.consumed == 2
@@ -1,8 +1,20 @@
-from unittest.mock import patch
+import asyncio
+import itertools
+import math
+import random
+import time
+from collections import deque
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
-from llm_mcts_inference.mcts import MCTS, Node
+from llm_mcts_inference.mcts import (
+    CONVERGENCE_WINDOW,
+    MCTS,
+    VECTORIZE_MIN_CHILDREN,
+    VIRTUAL_LOSS,
+    Node,
+)
 
 
 @pytest.fixture
@@ -29,6 +41,15 @@ def test_node_initialization(mock_node):
     assert len(mock_node.children) == 0
 
 
+def test_node_has_no_instance_dict(mock_node):
+    """
+    Test that Node stores its attributes in slots.
+    """
+    assert not hasattr(mock_node, "__dict__")
+    with pytest.raises(AttributeError):
+        mock_node.unknown_attribute = 1
+
+
 def test_node_is_fully_expanded(mock_node):
     """Test the is_fully_expanded method."""
     assert not mock_node.is_fully_expanded()
@@ -62,6 +83,27 @@ def test_node_best_child():
     assert best_child.value == 30
 
 
+def test_node_best_child_vectorized():
+    """Test that the vectorized best_child agrees with the scalar UCT loop."""
+    parent_node = Node("Prompt", "Answer", VECTORIZE_MIN_CHILDREN, 1.0)
+    parent_node.visits = 50
+    for i in range(VECTORIZE_MIN_CHILDREN):
+        child_node = Node("Prompt", f"Answer {i}", VECTORIZE_MIN_CHILDREN, 1.0)
+        parent_node.add_child(child_node)
+        # statistics updated after add_child are mirrored into the parent's arrays
+        child_node.visits = i + 2
+        child_node.value = (i % 3) * 0.9
+
+    expected = max(
+        parent_node.children,
+        key=lambda c: c.value / c.visits + math.sqrt(math.log(parent_node.visits) / c.visits),
+    )
+    assert parent_node.best_child() is expected
+
+    parent_node.children[0].visits = 0
+    assert parent_node.best_child() is parent_node.children[0]
+
+
 @pytest.fixture
 def mock_mcts():
     """Fixture to create a mock MCTS instance for testing."""
@@ -96,3 +138,254 @@ def test_mcts_initialization(mock_mcts):
     assert mock_mcts.verbose is False
     assert mock_mcts.root.answer == "Mock response"
     assert mock_mcts.root.level == 0
+
+
+def _mock_batch(value):
+    """Create an AsyncMock that returns `value` once per answer of a batched call."""
+    return AsyncMock(side_effect=lambda *args, answers, **kwargs: [value] * len(answers))
+
+
+def test_mcts_expand(mock_mcts):
+    """Test that expand refines all new children of a node."""
+    mock_feedback = _mock_batch("Feedback")
+    with (
+        patch("llm_mcts_inference.mcts.agenerate_feedback_batch", mock_feedback),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_improved_version_batch",
+            _mock_batch("Improved answer"),
+        ),
+    ):
+        new_children = asyncio.run(mock_mcts.expand(mock_mcts.root))
+
+    assert len(new_children) == 3
+    assert mock_mcts.root.children == new_children
+    assert all(child.answer == "Improved answer" for child in new_children)
+    assert all(child.level == 1 for child in new_children)
+    mock_feedback.assert_awaited_once()
+
+
+def test_mcts_search(mock_mcts):
+    """Test that search simulates every newly expanded sibling."""
+    mock_rating = _mock_batch(0.5)
+    with (
+        patch("llm_mcts_inference.mcts.agenerate_feedback_batch", _mock_batch("Feedback")),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_improved_version_batch",
+            AsyncMock(
+                side_effect=lambda *args, answers, **kwargs: [
+                    f"Improved {i}" for i in range(len(answers))
+                ]
+            ),
+        ),
+        patch("llm_mcts_inference.mcts.agenerate_rating_batch", mock_rating),
+    ):
+        mock_mcts.iterations = 1
+        answer = asyncio.run(mock_mcts.search())
+
+    assert answer == "Improved 0"
+    mock_rating.assert_awaited_once()
+    assert mock_rating.await_args.kwargs["answers"] == ["Improved 0", "Improved 1", "Improved 2"]
+    assert mock_mcts.root.visits == 4
+    assert mock_mcts.root.value == pytest.approx(1.5)
+
+
+def test_mcts_simulate_batch_memoizes_ratings(mock_mcts):
+    """Test that every distinct answer is only rated once."""
+    nodes = [Node("Prompt", answer, 3, 1.0) for answer in ["A", "B", "A"]]
+    mock_rating = AsyncMock(side_effect=lambda *args, answers, **kwargs: [0.1, 0.2][: len(answers)])
+    with patch("llm_mcts_inference.mcts.agenerate_rating_batch", mock_rating):
+        assert asyncio.run(mock_mcts.simulate_batch(nodes)) == [0.1, 0.2, 0.1]
+        assert asyncio.run(mock_mcts.simulate(Node("Prompt", "B", 3, 1.0))) == 0.2
+
+    mock_rating.assert_awaited_once()
+    assert mock_rating.await_args.kwargs["answers"] == ["A", "B"]
+
+
+def test_mcts_search_root_parallel(mock_mcts):
+    """Test that root parallel workers use distinct seeds and their trees are merged."""
+    mock_feedback = _mock_batch("Feedback")
+    with (
+        patch("llm_mcts_inference.mcts.agenerate_feedback_batch", mock_feedback),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_improved_version_batch",
+            _mock_batch("Improved answer"),
+        ),
+        patch("llm_mcts_inference.mcts.agenerate_rating_batch", _mock_batch(0.5)),
+    ):
+        mock_mcts.iterations = 2
+        answer = asyncio.run(mock_mcts.search_root_parallel(num_workers=2))
+
+    assert answer == "Improved answer"
+    seeds = {c.kwargs["request_settings"]["seed"] for c in mock_feedback.await_args_list}
+    assert seeds == {42, 43}
+    assert mock_mcts.request_settings["seed"] == 42
+    # identical answers of both workers are merged into a single root child
+    assert len(mock_mcts.root.children) == 1
+    assert mock_mcts.root.children[0].parent is mock_mcts.root
+    assert mock_mcts.root.visits == 8
+
+
+def test_mcts_rng_is_seeded_per_worker(mock_mcts):
+    """Test that the MCTS and each root parallel worker own a RNG seeded from the request."""
+    assert mock_mcts._rng.random() == random.Random(42).random()
+
+    worker = mock_mcts._spawn_worker(1)
+    assert worker._rng is not mock_mcts._rng
+    assert worker._rng.random() == random.Random(43).random()
+
+
+def test_mcts_search_tree_parallel(mock_mcts):
+    """Test that concurrent iterations share one tree and leave no virtual loss behind."""
+
+    async def slow_improved_versions(*args, answers, **kwargs):
+        await asyncio.sleep(0.01)
+        return ["Improved answer"] * len(answers)
+
+    mock_improved = AsyncMock(side_effect=slow_improved_versions)
+    with (
+        patch("llm_mcts_inference.mcts.agenerate_feedback_batch", _mock_batch("Feedback")),
+        patch("llm_mcts_inference.mcts.agenerate_improved_version_batch", mock_improved),
+        patch("llm_mcts_inference.mcts.agenerate_rating_batch", _mock_batch(0.5)),
+    ):
+        mock_mcts.iterations = 2
+        mock_mcts.parallel = 2
+        asyncio.run(mock_mcts.search())
+
+    # the second iteration waited for the first expansion instead of expanding the root again
+    mock_improved.assert_awaited_once()
+    assert len(mock_mcts.root.children) == 3
+    assert mock_mcts.root.visits == 5
+    assert mock_mcts.root.value == pytest.approx(2.0)
+    assert sum(child.visits for child in mock_mcts.root.children) == 7
+
+
+def test_mcts_search_tree_parallel_overlaps_latency(mock_mcts):
+    """Test that concurrent iterations overlap the latency of their model requests."""
+    latency = 0.05
+    answer_ids = itertools.count()
+
+    async def slow_answers(*args, answers, **kwargs):
+        await asyncio.sleep(latency)
+        return [f"Answer {next(answer_ids)}" for _ in answers]
+
+    async def slow_ratings(*args, answers, **kwargs):
+        await asyncio.sleep(latency)
+        return [0.5] * len(answers)
+
+    with (
+        patch(
+            "llm_mcts_inference.mcts.agenerate_feedback_batch",
+            AsyncMock(side_effect=slow_answers),
+        ),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_improved_version_batch",
+            AsyncMock(side_effect=slow_answers),
+        ),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_rating_batch", AsyncMock(side_effect=slow_ratings)
+        ),
+    ):
+        mock_mcts.iterations = 6
+        mock_mcts.parallel = 3
+
+        start = time.perf_counter()
+        asyncio.run(mock_mcts.search())
+        elapsed = time.perf_counter() - start
+
+    # a sequential search waits for feedback, refinement and rating in every iteration
+    assert elapsed < mock_mcts.iterations * 3 * latency / 2
+
+
+def test_mcts_virtual_loss(mock_mcts):
+    """Test that select adds a virtual loss which revert_virtual_loss removes again."""
+    mock_mcts.parallel = 2
+    for i in range(3):
+        mock_mcts.root.add_child(Node("Prompt", f"Answer {i}", 3, 1.0, parent=mock_mcts.root))
+
+    selected = mock_mcts.select(mock_mcts.root)
+    assert selected.visits == 1 + VIRTUAL_LOSS
+    assert selected.value == -VIRTUAL_LOSS
+    # the in-flight path is penalized, so the next selection picks a different child
+    assert mock_mcts.select(mock_mcts.root) is not selected
+
+    mock_mcts.revert_virtual_loss(selected)
+    assert selected.visits == 1
+    assert selected.value == 0.0
+
+
+def _add_root_children(mcts, visits):
+    """Attach children with the given visit counts to the root of an MCTS instance."""
+    for i, child_visits in enumerate(visits):
+        child = Node("Prompt", f"Answer {i}", 3, 1.0, parent=mcts.root)
+        mcts.root.add_child(child)
+        child.visits = child_visits
+        child.value = 0.5 * child_visits
+
+
+def test_mcts_should_stop_when_leader_is_decided(mock_mcts):
+    """Test that the search stops once the remaining iterations cannot change the answer."""
+    _add_root_children(mock_mcts, [10, 2, 1])
+
+    # the runner-up can gain at most 3 visits per remaining iteration
+    assert mock_mcts._should_stop(2, deque())
+    assert not mock_mcts._should_stop(3, deque())
+
+
+def test_mcts_should_stop_when_decided_can_be_disabled(mock_mcts):
+    """Test that the decided-leader check is skipped when disabled."""
+    _add_root_children(mock_mcts, [10, 2, 1])
+
+    assert not mock_mcts._should_stop(2, deque(), stop_when_decided=False)
+
+
+def test_mcts_root_parallel_workers_run_full_share(mock_mcts):
+    """Test that root parallel workers do not stop early on a leader decided in their tree."""
+    iterations_run = 0
+
+    async def lopsided_iteration(self):
+        nonlocal iterations_run
+        iterations_run += 1
+        if not self.root.children:
+            _add_root_children(self, [1, 1, 1])
+        self.root.children[0].visits += 10
+
+    with patch.object(MCTS, "_run_iteration", autospec=True, side_effect=lopsided_iteration):
+        asyncio.run(mock_mcts._spawn_worker(0)._run_iterations(5))
+        assert iterations_run < 5, "A single tree should stop once its leader is decided."
+
+        iterations_run = 0
+        asyncio.run(mock_mcts.search_root_parallel(num_workers=2))
+
+    assert iterations_run == mock_mcts.iterations
+
+
+def test_mcts_should_stop_on_converged_value(mock_mcts):
+    """Test that the optional convergence check stops once the leader's value plateaus."""
+    _add_root_children(mock_mcts, [5, 4, 1])
+    history = deque(maxlen=CONVERGENCE_WINDOW)
+
+    assert not any(mock_mcts._should_stop(10, history) for _ in range(CONVERGENCE_WINDOW))
+
+    mock_mcts.convergence_threshold = 0.01
+    history.clear()
+    results = [mock_mcts._should_stop(10, history) for _ in range(CONVERGENCE_WINDOW)]
+    assert results == [False] * (CONVERGENCE_WINDOW - 1) + [True]
+
+
+def test_mcts_search_stops_early(mock_mcts):
+    """Test that search skips the remaining iterations once _should_stop is met."""
+    mock_rating = _mock_batch(0.5)
+    with (
+        patch("llm_mcts_inference.mcts.agenerate_feedback_batch", _mock_batch("Feedback")),
+        patch(
+            "llm_mcts_inference.mcts.agenerate_improved_version_batch",
+            _mock_batch("Improved answer"),
+        ),
+        patch("llm_mcts_inference.mcts.agenerate_rating_batch", mock_rating),
+        patch.object(mock_mcts, "_should_stop", return_value=True) as mock_should_stop,
+    ):
+        asyncio.run(mock_mcts.search())
+
+    mock_rating.assert_awaited_once()
+    # one iteration done, nine remaining
+    assert mock_should_stop.call_args.args[0] == mock_mcts.iterations - 1
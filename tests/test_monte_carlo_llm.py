@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import pytest
+
+from llm_mcts_inference.config import DEFAULT_REQUEST_SETTINGS
+from llm_mcts_inference.MonteCarloLLM import MonteCarloLLM
+
+
+def test_generate_does_not_mutate_request_settings(monkeypatch):
+    """
+    Test that generate neither mutates the default nor the caller's request settings.
+    """
+    monkeypatch.delenv("OLLAMA_API_BASE", raising=False)
+    default_settings = dict(DEFAULT_REQUEST_SETTINGS)
+    caller_settings = {"temperature": 0.5}
+    llm = MonteCarloLLM(model_name="ollama/llama3.2", api_base="")
+
+    with patch("llm_mcts_inference.MonteCarloLLM.MCTS") as mock_mcts:
+        mock_mcts.return_value.search.return_value = None
+        with patch("asyncio.run", return_value="Answer"):
+            llm.generate("Prompt")
+            llm.generate("Prompt", request_settings=caller_settings)
+
+    first_settings = mock_mcts.call_args_list[0].kwargs["request_settings"]
+    second_settings = mock_mcts.call_args_list[1].kwargs["request_settings"]
+
+    assert first_settings == {
+        **default_settings,
+        "api_base": "http://localhost:11434",
+        "model": "ollama/llama3.2",
+    }
+    assert second_settings == {
+        "temperature": 0.5,
+        "api_base": "http://localhost:11434",
+        "model": "ollama/llama3.2",
+    }
+    assert DEFAULT_REQUEST_SETTINGS == default_settings
+    assert caller_settings == {"temperature": 0.5}
+
+
+@pytest.mark.parametrize(
+    "model_name, expected_api_base",
+    [
+        ("ollama/llama3.2", "http://localhost:11434"),
+        ("ollama_chat/llama3.2", "http://localhost:11434"),
+        ("hosted_vllm/meta-llama/Llama-3.1-8B-Instruct", "http://localhost:8000/v1"),
+        ("lm_studio/qwen2.5-7b-instruct", "http://localhost:1234/v1"),
+        ("openai/gpt-4o-mini", ""),
+        ("openai/my-lm_studio-export", ""),
+        ("openai/ollama-finetune", ""),
+    ],
+)
+def test_default_api_base_of_local_providers(monkeypatch, model_name, expected_api_base):
+    """
+    Test that models of local inference servers default to the server's usual api_base.
+    """
+    for env_var in ("OLLAMA_API_BASE", "HOSTED_VLLM_API_BASE", "LM_STUDIO_API_BASE"):
+        monkeypatch.delenv(env_var, raising=False)
+
+    assert MonteCarloLLM(model_name=model_name).api_base == expected_api_base
+
+
+@pytest.mark.parametrize(
+    "model_name, env_var",
+    [
+        ("ollama/llama3.2", "OLLAMA_API_BASE"),
+        ("hosted_vllm/meta-llama/Llama-3.1-8B-Instruct", "HOSTED_VLLM_API_BASE"),
+        ("lm_studio/qwen2.5-7b-instruct", "LM_STUDIO_API_BASE"),
+    ],
+)
+def test_env_configured_api_base_is_respected(monkeypatch, model_name, env_var):
+    """
+    Test that no default api_base overrides the one litellm reads from the environment.
+    """
+    monkeypatch.setenv(env_var, "http://gpu-box:9000")
+
+    assert MonteCarloLLM(model_name=model_name).api_base == ""
+
+
+def test_explicit_api_base_is_kept():
+    """
+    Test that an explicit api_base is not replaced for local providers.
+    """
+    llm = MonteCarloLLM(model_name="ollama/llama3.2", api_base="http://gpu-box:11434")
+    assert llm.api_base == "http://gpu-box:11434"
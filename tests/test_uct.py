@@ -0,0 +1,30 @@
+import math
+
+import numpy as np
+import pytest
+
+from llm_mcts_inference.utils.uct import _uct_argmax_loop, _uct_argmax_numpy, uct_argmax
+
+
+@pytest.mark.parametrize("kernel", [_uct_argmax_loop, _uct_argmax_numpy, uct_argmax])
+def test_uct_argmax(kernel):
+    """
+    Test that every UCT kernel picks the child with the highest weight.
+    """
+    visits = np.array([2.0, 5.0, 3.0, 8.0])
+    values = np.array([0.2, 4.0, 1.5, 7.0])
+    log_parent_visits = math.log(18)
+
+    weights = values / visits + np.sqrt(log_parent_visits / visits)
+    assert kernel(visits, values, math.sqrt(log_parent_visits)) == int(np.argmax(weights))
+
+
+@pytest.mark.parametrize("kernel", [_uct_argmax_loop, _uct_argmax_numpy, uct_argmax])
+def test_uct_argmax_prefers_unvisited(kernel):
+    """
+    Test that every UCT kernel picks the first unvisited child.
+    """
+    visits = np.array([4.0, 0.0, 0.0])
+    values = np.array([3.9, 0.0, 0.0])
+
+    assert kernel(visits, values, math.sqrt(math.log(5))) == 1
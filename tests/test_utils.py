@@ -4,6 +4,7 @@ from llm_mcts_inference.utils.utils import (
     extract_first_number,
     is_numeric_score,
     normalize_rating_score,
+    normalize_rating_scores,
 )
 
 
@@ -28,6 +29,21 @@ def test_normalize_rating_score(input_score, expected_output):
     assert normalize_rating_score(input_score) == pytest.approx(expected_output, rel=1e-6)
 
 
+@pytest.mark.parametrize(
+    "scores",
+    [
+        [42, 95, 0, -10, 100, "85", "0", "-20", "120"],
+        list(range(-250, 750)),
+    ],
+)
+def test_normalize_rating_scores(scores):
+    """
+    Test normalize_rating_scores matches normalize_rating_score element-wise.
+    """
+    expected = [normalize_rating_score(score) for score in scores]
+    assert normalize_rating_scores(scores).tolist() == pytest.approx(expected, rel=1e-6)
+
+
 def test_invalid_inputs():
     """
     Test that invalid inputs raise appropriate exceptions.
@@ -58,6 +74,13 @@ def test_invalid_inputs():
         ("1.23e10", False),
         (" ", False),
         (".", False),
+        ("-.5", True),
+        ("1-2", False),
+        ("-", False),
+        ("--1", False),
+        ("5-", False),
+        (" 85", False),
+        ("\u0668\u0665", True),  # Arabic-Indic digits, accepted by float()
     ],
 )
 def test_is_numeric_score(input_string, expected_output):